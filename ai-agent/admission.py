@@ -0,0 +1,220 @@
+# admission.py - admission control in front of the agent's LLM runs
+#
+# A chat request passes these gates before it reaches the LLM (and the
+# provider quota behind it):
+#
+# 1. single flight: an identical message in the same chat session of the same
+#    owner that is already running is waited for instead of run again. Its
+#    reply is shared only if that run left the tasks unchanged; after a write
+#    every caller runs itself
+# 2. a token bucket per client (remote address and owner): AGENT_RATE_LIMIT
+#    runs/s with bursts of AGENT_RATE_BURST; an empty bucket is answered with
+#    429 and Retry-After. Callers sharing a run are not charged
+# 3. a bounded number of concurrent LLM runs (AGENT_MAX_CONCURRENCY). Further
+#    runs wait in a queue served round robin across clients, so one busy
+#    client cannot starve the others. A full queue (AGENT_QUEUE_SIZE) or a wait
+#    longer than AGENT_QUEUE_TIMEOUT seconds is answered with 503
+#
+# Fast-path commands and cached replies need no LLM and skip every gate, so
+# they keep being answered while clients are rate limited or the queue is full. Everything here runs on the event
+# loop, so no locks are needed; the limits apply per worker process.
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Tuple
+
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "8"))
+AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "64"))
+AGENT_QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "10"))
+AGENT_RATE_LIMIT = float(os.getenv("AGENT_RATE_LIMIT", "2"))  # 0 disables
+AGENT_RATE_BURST = int(os.getenv("AGENT_RATE_BURST", "10"))
+MAX_TRACKED_CLIENTS = 10_000
+
+
+class Rejected(Exception):
+    """A request turned away; maps to an HTTP status with a Retry-After header."""
+
+    def __init__(self, status: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBuckets:
+    """Per-client token buckets refilled lazily at `rate` tokens/s up to `burst`."""
+
+    def __init__(self, rate: float = AGENT_RATE_LIMIT, burst: int = AGENT_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        # client -> (tokens, time of last refill); least recently seen first
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, client: Hashable) -> None:
+        """Spend one of the client's tokens or raise Rejected (429)"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            raise Rejected(429, "Too many chat requests; slow down", (1 - tokens) / self.rate)
+        self._buckets[client] = (tokens - 1, now)
+        while len(self._buckets) > MAX_TRACKED_CLIENTS:
+            # the longest-idle client; its bucket has most likely refilled anyway
+            self._buckets.popitem(last=False)
+
+
+class FairQueue:
+    """At most `limit` concurrent holders; waiters are let in round robin by client."""
+
+    def __init__(
+        self,
+        limit: int = AGENT_MAX_CONCURRENCY,
+        max_waiting: int = AGENT_QUEUE_SIZE,
+        timeout: float = AGENT_QUEUE_TIMEOUT,
+    ):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.running = 0
+        self.waiting = 0
+        # client -> its waiters in arrival order; the next client to serve first
+        self._queues: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+
+    async def acquire(self, client: Hashable) -> None:
+        if self.running < self.limit and not self.waiting:
+            self.running += 1
+            return
+        if self.waiting >= self.max_waiting:
+            raise Rejected(503, "The agent is busy; try again shortly", self.timeout / 2)
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(waiter)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._forget(client, waiter)
+            raise Rejected(503, "Timed out waiting for the agent; try again shortly", self.timeout / 2)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as the caller gave up
+            else:
+                self._forget(client, waiter)
+            raise
+
+    def _forget(self, client: Hashable, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(client)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[client]
+
+    def release(self) -> None:
+        """Hand the slot to the next client's oldest waiter, or free it"""
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.waiting -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one run when its result is shareable."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Tuple[Any, bool]]]) -> Tuple[Any, bool]:
+        """Run call() -> (result, shareable), or wait for the running one; returns (result, coalesced)"""
+        while key in self._calls:
+            result, shareable = await asyncio.shield(self._calls[key])
+            if shareable:
+                return result, True
+            # the run changed data, so its reply may not hold for this caller
+        flight = asyncio.get_running_loop().create_future()
+        self._calls[key] = flight
+        try:
+            result, shareable = await call()
+        except BaseException as e:
+            flight.set_exception(e)
+            # nobody may be waiting; don't log "exception was never retrieved"
+            flight.exception()
+            raise
+        else:
+            flight.set_result((result, shareable))
+            return result, False
+        finally:
+            del self._calls[key]
+
+
+class ChatAdmission:
+    """The rate limit, fair queue and single flight shared by the chat endpoints."""
+
+    def __init__(self):
+        self.buckets = TokenBuckets()
+        self.queue = FairQueue()
+        self.flights = SingleFlight()
+        self.counts = {"admitted": 0, "coalesced": 0, "rate_limited": 0, "overloaded": 0}
+
+    def check(self, client: Hashable) -> None:
+        """Turn the request away now if `client` is over its rate or the queue is full"""
+        try:
+            self.buckets.take(client)
+        except Rejected:
+            self.counts["rate_limited"] += 1
+            raise
+        if self.queue.waiting >= self.queue.max_waiting:
+            self.counts["overloaded"] += 1
+            raise Rejected(503, "The agent is busy; try again shortly", self.queue.timeout / 2)
+
+    @asynccontextmanager
+    async def slot(self, client: Hashable) -> AsyncIterator[None]:
+        """Hold one of the concurrent run slots for the block"""
+        try:
+            await self.queue.acquire(client)
+        except Rejected:
+            self.counts["overloaded"] += 1
+            raise
+        self.counts["admitted"] += 1
+        try:
+            yield
+        finally:
+            self.queue.release()
+
+    async def coalesce(
+        self, key: Hashable, client: Hashable, call: Callable[[], Awaitable[Tuple[Any, bool]]]
+    ) -> Any:
+        """call() -> (result, shareable), or the result of the identical call already running.
+
+        Only the caller that runs call() is charged a token from `client`'s
+        bucket; callers sharing its run are not.
+        """
+        async def lead() -> Tuple[Any, bool]:
+            # runs before the first await, so no caller can have joined a rejected run
+            self.check(client)
+            return await call()
+
+        result, coalesced = await self.flights.run(key, lead)
+        if coalesced:
+            self.counts["coalesced"] += 1
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.counts, "running": self.queue.running, "waiting": self.queue.waiting}
+
+
+chat_admission = ChatAdmission()
@@ -1,84 +1,183 @@
 # agent.py - Todo List Agent using Agno
 
-from agno.agent import Agent
-from agno.tools import tool
-from agno.models.google import Gemini
-from agno.storage.sqlite import SqliteStorage
-from models import add_task, update_task, get_all_tasks, delete_task, get_next_task_id
+from models import (
+    delete_task, insert_task, insert_tasks, patch_task, set_status, list_tasks, count_tasks,
+    search_tasks, get_data_version, get_outcome, run_once, DB_NAME,
+)
+from task_repository import BUSY_TIMEOUT_MS, WORKERS, current_owner
+from intents import match_intent, router_stats
+from cache import reply_cache, normalize_message
+from metrics import agent_errors, agent_replays, atool_hook, observe_tool, record_run
+from dispatch import CREATE, READ, WRITE, CallOrder, call_order, dispatcher
+from admission import Rejected, chat_admission
+from prompt import (
+    AGENT_HISTORY_TOKENS, AGENT_PROMPT_STYLE, estimate_tokens, measure_prompt, prompt_stats, trim_history,
+)
+from collections import OrderedDict
+from functools import wraps
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
 from dotenv import load_dotenv
+import asyncio
+import contextvars
+import hashlib
+import inspect
+import json
+import logging
 import os
+import re
+import threading
+import time
+
+if TYPE_CHECKING:
+    from agno.agent import Agent
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # --- Model Configuration ---
 USE_VERTEX = os.getenv("GOOGLE_GENAI_USE_VERTEXAI", "false").lower() in ("1", "true", "yes")
 
-if USE_VERTEX:
-    llm = Gemini(
-        id="gemini-2.0-flash",
-        vertexai=True,
-    )
-else:
-    llm = Gemini(
+def build_llm():
+    from agno.models.google import Gemini
+
+    if USE_VERTEX:
+        return Gemini(
+            id="gemini-2.0-flash",
+            vertexai=True,
+        )
+    return Gemini(
         id="gemini-2.0-flash",
         api_key=os.getenv("GOOGLE_API_KEY"),
     )
 
 # --- Tools ---
+# Plain functions: the fast path calls them directly and load_agent_stack()
+# wraps them as agno tools only when an agent is first needed.
 
-@tool(show_result=True)
+def reports_failure(action: str):
+    """Tool decorator: an unexpected error becomes "Failed to <action>: ..." for the model.
+
+    The raising function stays available as __wrapped__ for replay_safe().
+    """
+    def decorate(fn):
+        @wraps(fn)
+        def tool(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                return tool.failure(e)
+        tool.failure = lambda e: f"Failed to {action}: {str(e)}"
+        return tool
+    return decorate
+
+@reports_failure("create task")
 def create_task(name: str, description: str = "", status: bool = False):
     """Create a new task with auto-generated ID. Call this function when user wants to add a new task."""
-    try:
-        next_id = get_next_task_id()
-        result = add_task(next_id, name, description, status)
-        return f"Created task #{next_id}: {name}"
-    except Exception as e:
-        return f"Failed to create task: {str(e)}"
+    task = insert_task(name, description, status)
+    return f"Created task #{task['id']}: {name}"
+
+@reports_failure("create tasks")
+def create_multiple_tasks(names: List[str], description: str = ""):
+    """Create several tasks at once. Call this function when user wants to add more than one task in a single message."""
+    names = [n.strip() for n in names if n and n.strip()]
+    if not names:
+        return "No task names given"
+    tasks = insert_tasks([{"name": n, "description": description} for n in names])
+    return "\n".join(f"Created task #{t['id']}: {t['name']}" for t in tasks)
 
-@tool(show_result=True)
+@reports_failure("update task")
 def update_task_info(task_id: int, name: str = None, description: str = None, status: bool = None):
     """Update an existing task's information. Call this function when user wants to modify a task."""
     try:
-        # Get current task to preserve unchanged fields
-        all_tasks = get_all_tasks()
-        current_task = next((task for task in all_tasks if task["id"] == task_id), None)
-        
-        if not current_task:
-            return f"Task #{task_id} not found"
-        
-        # Use current values if not provided
-        new_name = name if name is not None else current_task["name"]
-        new_description = description if description is not None else current_task["description"]
-        new_status = status if status is not None else current_task["status"]
-        
-        result = update_task(task_id, new_name, new_description, new_status)
-        return f"Updated task #{task_id}: {new_name}"
-    except Exception as e:
-        return f"Failed to update task: {str(e)}"
+        fields = {}
+        if name is not None:
+            fields["name"] = name
+        if description is not None:
+            fields["description"] = description
+        if status is not None:
+            fields["status"] = status
+        task = patch_task(task_id, **fields)
+        return f"Updated task #{task_id}: {task['name']}"
+    except ValueError:
+        return f"Task #{task_id} not found"
 
-@tool(show_result=True)
-def show_tasks():
-    """Display all tasks in a friendly format. Call this function when user wants to see their task list."""
-    try:
-        tasks = get_all_tasks()
-        if not tasks:
-            return "No tasks found. Time to get productive!"
-        
-        result = "Here are your tasks:\n\n"
-        for task in tasks:
-            status_icon = "✅" if task["status"] else "⏳"
-            status_text = "Done" if task["status"] else "Pending"
-            result += f"{status_icon} **Task #{task['id']}**: {task['name']}\n"
-            if task["description"]:
-                result += f"   📝 {task['description']}\n"
-            result += f"   Status: {status_text}\n\n"
-        
-        return result
-    except Exception as e:
-        return f"Failed to fetch tasks: {str(e)}"
+SHOW_TASKS_PAGE_SIZE = int(os.getenv("SHOW_TASKS_PAGE_SIZE", "20"))
+SHOW_TASKS_CHAR_BUDGET = int(os.getenv("SHOW_TASKS_CHAR_BUDGET", "2000"))
+
+_STATUS_FILTERS = {
+    "all": None, "": None,
+    "done": True, "completed": True, "complete": True,
+    "pending": False, "active": False, "incomplete": False,
+}
+
+def _render_task(task) -> str:
+    status_icon = "✅" if task["status"] else "⏳"
+    status_text = "Done" if task["status"] else "Pending"
+    lines = [f"{status_icon} **Task #{task['id']}**: {task['name']}"]
+    if task["description"]:
+        lines.append(f"   📝 {task['description']}")
+    lines.append(f"   Status: {status_text}")
+    return "\n".join(lines)
+
+def _render_task_compact(task) -> str:
+    return f"{'✅' if task['status'] else '⏳'} #{task['id']} {task['name']}"
+
+def render_task_list(tasks, header: str, footer: str = "", budget: int = SHOW_TASKS_CHAR_BUDGET) -> str:
+    """Render tasks within a character budget, falling back to one line per task"""
+    body = "\n\n".join(_render_task(t) for t in tasks)
+    if len(body) > budget:
+        lines = []
+        used = 0
+        for t in tasks:
+            line = _render_task_compact(t)
+            used += len(line) + 1
+            if used > budget:
+                lines.append(f"...and {len(tasks) - len(lines)} more on this page")
+                break
+            lines.append(line)
+        body = "\n".join(lines)
+    return "\n\n".join(part for part in (header, body, footer) if part)
+
+@reports_failure("fetch tasks")
+def show_tasks(status: str = "all", text: str = "", page: int = 1, limit: int = SHOW_TASKS_PAGE_SIZE):
+    """Display tasks in a friendly format, one page at a time. Call this function when user wants to see their task list.
+    status can be "all", "done" or "pending"; text filters by name/description; page starts at 1."""
+    status_filter = _STATUS_FILTERS.get((status or "").strip().lower())
+    page = max(1, int(page))
+    limit = max(1, min(int(limit), SHOW_TASKS_PAGE_SIZE))
+    counts = count_tasks(text or None)
+    if status_filter is None:
+        matching = counts["total"]
+    else:
+        matching = counts["done"] if status_filter else counts["pending"]
+    if not matching:
+        return "No tasks found. Time to get productive!"
 
-@tool(show_result=True)
+    tasks = list_tasks(
+        status=status_filter, text=text or None, limit=limit, offset=(page - 1) * limit
+    )["tasks"]
+    if not tasks:
+        return f"Page {page} is empty; there are {matching} matching tasks."
+
+    first = (page - 1) * limit + 1
+    last = first + len(tasks) - 1
+    header = (
+        f"Here are your tasks ({first}-{last} of {matching}; "
+        f"{counts['done']} done, {counts['pending']} pending):"
+    )
+    footer = f"More tasks on page {page + 1}." if last < matching else ""
+    return render_task_list(tasks, header, footer)
+
+@reports_failure("search tasks")
+def find_tasks(query: str, limit: int = 10):
+    """Search tasks by words in their name or description. Call this function when user asks to find a specific task."""
+    tasks = search_tasks(query, limit=max(1, min(int(limit), SHOW_TASKS_PAGE_SIZE)))
+    if not tasks:
+        return f"No tasks match '{query}'"
+    return render_task_list(tasks, f"Tasks matching '{query}':")
+
+@reports_failure("delete task")
 def remove_task(task_id: int):
     """Delete a task by ID. Call this function when user wants to remove a task."""
     try:
@@ -86,59 +185,114 @@ def remove_task(task_id: int):
         return f"Task deleted: {result}"
     except ValueError as e:
         return f"Error: {str(e)}"
-    except Exception as e:
-        return f"Failed to delete task: {str(e)}"
 
-@tool(show_result=True)
+@reports_failure("mark task complete")
 def mark_task_complete(task_id: int):
     """Mark a task as completed. Call this function when user wants to mark a task as done."""
     try:
-        # Get current task
-        all_tasks = get_all_tasks()
-        current_task = next((task for task in all_tasks if task["id"] == task_id), None)
-        
-        if not current_task:
-            return f"Task #{task_id} not found"
-        
-        if current_task["status"]:
+        if not set_status(task_id, True):
             return f"Task #{task_id} is already completed"
-        
-        result = update_task(task_id, current_task["name"], current_task["description"], True)
         return f"Task #{task_id} marked as complete"
-    except Exception as e:
-        return f"Failed to mark task complete: {str(e)}"
+    except ValueError:
+        return f"Task #{task_id} not found"
 
-@tool(show_result=True)
+@reports_failure("mark task pending")
 def mark_task_pending(task_id: int):
     """Mark a task as pending/incomplete. Call this function when user wants to mark a task as not done."""
     try:
-        # Get current task
-        all_tasks = get_all_tasks()
-        current_task = next((task for task in all_tasks if task["id"] == task_id), None)
-        
-        if not current_task:
-            return f"Task #{task_id} not found"
-        
-        if not current_task["status"]:
+        if not set_status(task_id, False):
             return f"Task #{task_id} is already pending"
-        
-        result = update_task(task_id, current_task["name"], current_task["description"], False)
         return f"Task #{task_id} marked as pending"
-    except Exception as e:
-        return f"Failed to mark task pending: {str(e)}"
+    except ValueError:
+        return f"Task #{task_id} not found"
 
 # --- Agent Configuration ---
-agent = Agent(
-    model=llm,
-    tools=[
-        create_task, 
-        update_task_info, 
-        show_tasks, 
-        remove_task, 
-        mark_task_complete, 
-        mark_task_pending
-    ],
-    description="""
+TOOLS = [
+    create_task, 
+    create_multiple_tasks,
+    update_task_info, 
+    show_tasks, 
+    find_tasks,
+    remove_task, 
+    mark_task_complete, 
+    mark_task_pending
+]
+
+# how each tool's calls are ordered against others in the same model response (see dispatch.py)
+TOOL_ACCESS = {
+    "create_task": CREATE,
+    "create_multiple_tasks": CREATE,
+    "update_task_info": WRITE,
+    "remove_task": WRITE,
+    "mark_task_complete": WRITE,
+    "mark_task_pending": WRITE,
+    "show_tasks": READ,
+    "find_tasks": READ,
+}
+
+# --- Replay-safe mutations ---
+# A chat request may carry an idempotency key (the Idempotency-Key header).
+# Every create/update/delete tool call of that request then runs through
+# run_once() under a key derived from the request key and the call, so the
+# write and its outbox record commit together. When the client retries after
+# a timeout or an error, the model asks for the same calls again and gets the
+# recorded results back instead of writing twice. A finished run's reply is
+# recorded as well, so retrying a completed request needs no LLM call.
+AGENT_RUN_TIMEOUT = float(os.getenv("AGENT_RUN_TIMEOUT", "60"))  # seconds per agent run; 0 disables
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+class RunKeys:
+    """Idempotency keys for the tool calls and reply of one keyed chat request"""
+
+    def __init__(self, key: str, message: str):
+        # the same key with a different message is a different request
+        self.key = f"{key}:{_digest(normalize_message(message))}"
+        self._calls: Dict[str, int] = {}
+
+    @property
+    def reply_key(self) -> str:
+        return f"{self.key}:reply"
+
+    def tool_key(self, name: str, kwargs: Dict[str, Any]) -> str:
+        """Key of a tool call; the n-th identical call in a request gets the n-th key"""
+        call = _digest(json.dumps([name, kwargs], sort_keys=True, default=str))
+        n = self._calls[call] = self._calls.get(call, 0) + 1
+        return f"{self.key}:{call}:{n}"
+
+current_run: "contextvars.ContextVar[Optional[RunKeys]]" = contextvars.ContextVar("agent_run", default=None)
+
+def replay_safe(fn: Callable[..., Any], kwargs: Dict[str, Any]) -> Callable[..., Any]:
+    """fn, or for a mutating tool called in a keyed request, fn run at most once for this call"""
+    run = current_run.get()
+    if run is None or TOOL_ACCESS[fn.__name__] == READ:
+        return fn
+    key = run.tool_key(fn.__name__, kwargs)
+
+    @wraps(fn)
+    def once(**kwargs):
+        # the undecorated tool raises, so an error (say "database is locked")
+        # rolls back without being recorded and a retry runs the call again
+        try:
+            result, replayed = run_once(key, lambda: fn.__wrapped__(**kwargs))
+        except Exception as e:
+            return fn.failure(e)
+        if replayed:
+            agent_replays.inc("tool")
+        return result
+    return once
+
+def async_tool(fn):
+    """Async twin of a tool with the same signature and docstring, run by the dispatcher"""
+    access = TOOL_ACCESS[fn.__name__]
+
+    @wraps(fn)
+    async def run(**kwargs):
+        return await dispatcher.run(replay_safe(fn, kwargs), kwargs, access=access, key=kwargs.get("task_id"))
+    return run
+
+AGENT_DESCRIPTION = """
         You are a todo list management AI. Your ONLY job is to use the provided tools to help users manage their tasks.
         
         CRITICAL: You MUST use the tools provided. Do NOT try to handle tasks manually or show raw data.
@@ -150,10 +304,15 @@ agent = Agent(
         4. ALWAYS use `mark_task_pending` when user wants to mark a task as not done
         5. ALWAYS use `update_task_info` when user wants to modify a task
         6. ALWAYS use `remove_task` when user wants to delete a task
+        7. ALWAYS use `create_multiple_tasks` when user wants to add several tasks in one message
+        8. ALWAYS use `find_tasks` when user wants to find a task by what it is about
         
         **Examples:**
         - User: "Create a task called 'Buy groceries'" → Use `create_task(name="Buy groceries")`
+        - User: "Add milk, eggs and bread" → Use `create_multiple_tasks(names=["Milk", "Eggs", "Bread"])`
         - User: "Show me my tasks" → Use `show_tasks()`
+        - User: "What's still pending about groceries?" → Use `show_tasks(status="pending", text="groceries")`
+        - User: "Find the task about groceries" → Use `find_tasks(query="groceries")`
         - User: "Mark task 1 as complete" → Use `mark_task_complete(task_id=1)`
         - User: "Update task 2 description" → Use `update_task_info(task_id=2, description="new description")`
         
@@ -166,17 +325,436 @@ agent = Agent(
         - Return ONLY the tool response, nothing more
         
         Remember: You are a tool-using AI. Use the tools for everything and return their responses directly!
-    """,
-    markdown=True,
-    storage=SqliteStorage(db_file="todos.db", table_name="sessions"),
-    add_history_to_messages=True,
-    add_datetime_to_instructions=True,
-)
+    """
+
+# The same rules in a fraction of the tokens: the tool schemas already say
+# which tool does what, so only the non-obvious argument mappings and the
+# reply format are spelled out. No indentation, since whitespace costs tokens.
+AGENT_DESCRIPTION_COMPACT = """You manage a todo list. Always act through the tools; never invent tasks or show raw data.
+Examples: "what's still pending about groceries?" -> show_tasks(status="pending", text="groceries"); "add milk, eggs and bread" -> create_multiple_tasks(names=["Milk", "Eggs", "Bread"]).
+Reply with the tool's response only: no added text, no embellishment, no emojis besides ✅ and ⏳."""
+
+# "compact" also leaves out the current time, which no tool needs and which
+# made the system prompt differ on every call
+PROMPT_STYLE = AGENT_PROMPT_STYLE
+# never sent: a stand-in of the line agno adds in "full" mode, only used to
+# estimate the tokens "compact" saves by leaving it out
+DATETIME_INSTRUCTION = "\n- The current time is 2000-01-01 00:00:00.000000."
+
+def tool_description(fn) -> str:
+    """The tool's docstring; compact prompts drop the "Call this function when..." sentence"""
+    doc = inspect.getdoc(fn)
+    if PROMPT_STYLE == "compact":
+        doc = re.sub(r"\s*Call this function[^.]*\.", "", doc)
+    return doc
+
+def style_savings() -> Dict[str, int]:
+    """Estimated tokens the prompt style saves on instructions and tool schemas per call"""
+    if PROMPT_STYLE == "full":
+        return {}
+    return {
+        "instructions": estimate_tokens(AGENT_DESCRIPTION) + estimate_tokens(DATETIME_INSTRUCTION)
+        - estimate_tokens(AGENT_DESCRIPTION_COMPACT),
+        "tools": sum(estimate_tokens(inspect.getdoc(fn)) - estimate_tokens(tool_description(fn)) for fn in TOOLS),
+    }
+
+DEFAULT_SESSION_ID = "default"
+AGENT_MAX_SESSIONS = int(os.getenv("AGENT_MAX_SESSIONS", "256"))
+# replayed history is capped at this many runs and then trimmed to
+# AGENT_HISTORY_TOKENS, oldest runs first (see prompt.py)
+AGENT_HISTORY_RUNS = int(os.getenv("AGENT_HISTORY_RUNS", "10"))
+# Every run reloads its session from storage, so any worker can serve any
+# session. With several workers the per-session lock below is per process, so
+# runs also merge runs stored by other workers before writing instead of
+# overwriting them.
+REFRESH_SESSION = WORKERS > 1
+
+# Importing agno and the Gemini client and opening the session storage take
+# about a second, so none of it happens at import: processes that only serve
+# CRUD or the fast path never load it, and the first chat that needs the model
+# builds it once. Assign `llm` beforehand to use a different model.
+llm = None
+# one storage backend shared by every session; rows are keyed by session_id
+storage = None
+agent_tools: Optional[List[Any]] = None
+agent_class: Optional[type] = None
+_stack_lock = threading.Lock()
+
+def budgeted_agent_class() -> type:
+    """Agent subclass that trims replayed history to the token budget and records prompt sizes"""
+    from agno.agent import Agent
+
+    savings = style_savings()
+
+    # get_run_messages and _tools_for_model are agno 1.8 internals, hence the
+    # pinned agno version in requirements.txt
+    class BudgetedAgent(Agent):
+        def get_run_messages(self, **kwargs):
+            run_messages = super().get_run_messages(**kwargs)
+            # in place: the model appends this run's messages to the same list
+            trimmed = trim_history(run_messages.messages, AGENT_HISTORY_TOKENS)
+            sent = measure_prompt(run_messages.messages, getattr(self, "_tools_for_model", None))
+            prompt_stats.record(sent, {**savings, "history": trimmed})
+            return run_messages
+
+    return BudgetedAgent
+
+def load_agent_stack() -> None:
+    """Import agno and build the model, session storage and tools once"""
+    global llm, storage, agent_tools, agent_class
+    if agent_tools is not None:
+        return
+    with _stack_lock:
+        if agent_tools is not None:
+            return
+        from agno.storage.sqlite import SqliteStorage
+        from agno.tools import tool
+
+        if llm is None:
+            llm = build_llm()
+        # same busy timeout as the task pool, so workers wait for each other's session writes
+        storage = SqliteStorage(
+            db_url=f"sqlite:///{os.path.abspath(DB_NAME)}?timeout={BUSY_TIMEOUT_MS / 1000}",
+            table_name="sessions",
+        )
+        agent_class = budgeted_agent_class()
+        # async tools let agno await every call of one model response together
+        agent_tools = [
+            tool(show_result=True, description=tool_description(fn))(async_tool(fn)) for fn in TOOLS
+        ]
+
+async def aload_agent_stack() -> None:
+    # the first load imports agno, so keep it off the event loop
+    if agent_tools is None:
+        await asyncio.to_thread(load_agent_stack)
+
+def storage_session_id(owner: str, session_id: str) -> str:
+    """Session id in agno storage; owners never share a chat history.
+
+    Always prefixed, also for the default owner ("/<session_id>"), so no
+    session id can name another owner's session.
+    """
+    return f"{owner}/{session_id}"
+
+def build_agent(session_id: str, owner: str = "") -> "Agent":
+    """Build a lightweight agent bound to one owner's chat session"""
+    load_agent_stack()
+    return agent_class(
+        model=llm,
+        tools=agent_tools,
+        description=AGENT_DESCRIPTION_COMPACT if PROMPT_STYLE == "compact" else AGENT_DESCRIPTION,
+        markdown=True,
+        storage=storage,
+        session_id=storage_session_id(owner, session_id),
+        user_id=owner or None,
+        add_history_to_messages=True,
+        num_history_runs=AGENT_HISTORY_RUNS,
+        add_datetime_to_instructions=PROMPT_STYLE == "full",
+        tool_hooks=[atool_hook],
+    )
+
+class AgentSessionPool:
+    """LRU of per-owner, per-session agents; evicted sessions are rebuilt from storage on next use."""
+
+    def __init__(self, max_sessions: int = AGENT_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[str, str], Tuple[Agent, asyncio.Lock]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str] = None) -> Tuple["Agent", asyncio.Lock]:
+        owner = current_owner.get()
+        key = (owner, session_id or DEFAULT_SESSION_ID)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                self._sessions.move_to_end(key)
+                return entry
+            entry = (build_agent(key[1], owner), asyncio.Lock())
+            self._sessions[key] = entry
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+sessions = AgentSessionPool()
 
-def chat_with_agent(message: str):
+# --- Fast path ---
+FAST_PATH_ENABLED = os.getenv("AGENT_FAST_PATH", "true").lower() in ("1", "true", "yes")
+TOOLS_BY_NAME = {fn.__name__: fn for fn in TOOLS}
+
+def fast_path(message: str) -> Optional[Tuple[str, Dict[str, Any], str]]:
+    """Run a simple command's tool directly; returns (tool name, args, reply) or None to use the LLM"""
+    if not FAST_PATH_ENABLED:
+        return None
+    match = match_intent(message)
+    router_stats.record(match[0] if match else None)
+    if match is None:
+        return None
+    _, tool_name, kwargs = match
+    reply = observe_tool(tool_name, replay_safe(TOOLS_BY_NAME[tool_name], kwargs), kwargs, path="fast")
+    return tool_name, kwargs, reply
+
+# --- Reply cache ---
+# Only replies that follow from the message alone are cached: every tool call
+# of the run was a read whose arguments the message spells out (or left at
+# their defaults). A reply without tool calls, or one whose arguments came
+# from the history ("next page" -> page=2), depends on the session, and the
+# key includes the session anyway so sessions never see each other's replies.
+TOOL_DEFAULTS = {
+    fn.__name__: {
+        name: param.default for name, param in inspect.signature(fn).parameters.items()
+        if param.default is not inspect.Parameter.empty
+    }
+    for fn in TOOLS
+}
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+def reply_from_message(message: str, tool_calls: List[Tuple[str, Dict[str, Any]]]) -> bool:
+    """Whether a run's reply follows from the message alone (see above)"""
+    if not tool_calls:
+        return False
+    words = _words(message)
+    for name, args in tool_calls:
+        if TOOL_ACCESS.get(name) != READ:
+            return False
+        defaults = TOOL_DEFAULTS[name]
+        for arg, value in (args or {}).items():
+            if value != defaults.get(arg, inspect.Parameter.empty) and not _words(str(value)) <= words:
+                return False
+    return True
+
+def run_tool_calls(response) -> List[Tuple[str, Dict[str, Any]]]:
+    return [(t.tool_name, t.tool_args or {}) for t in (getattr(response, "tools", None) or [])]
+
+def _cache_key(message: str, session_id: Optional[str], version: int) -> Tuple[str, str, str, int]:
+    return current_owner.get(), session_id or DEFAULT_SESSION_ID, normalize_message(message), version
+
+def cached_reply(message: str, session_id: Optional[str] = None) -> Tuple[Optional[str], int]:
+    """Look up the session's cached reply for this message at the current data version"""
+    version = get_data_version()
+    return reply_cache.get(_cache_key(message, session_id, version)), version
+
+def remember_reply(
+    message: str, session_id: Optional[str], version: int, reply: str, tool_calls: List[Tuple[str, Dict[str, Any]]]
+) -> bool:
+    """Cache the reply if it follows from the message alone; returns whether the run left the task table untouched"""
+    # only runs that left the task table untouched produce reusable replies
+    unchanged = get_data_version() == version
+    if reply and unchanged and reply_from_message(message, tool_calls):
+        reply_cache.put(_cache_key(message, session_id, version), reply)
+    return unchanged
+
+def recorded_reply(run: Optional[RunKeys]) -> Optional[str]:
+    """Reply of an earlier attempt of this keyed request that ran to the end"""
+    if run is None:
+        return None
+    reply = get_outcome(run.reply_key)
+    if reply is not None:
+        agent_replays.inc("reply")
+    return reply
+
+def record_reply(run: Optional[RunKeys], reply: str) -> None:
+    if run is not None and reply:
+        run_once(run.reply_key, lambda: reply)
+
+def timeout_reply(run: Optional[RunKeys]) -> str:
+    if run is None:
+        return f"Sorry, the agent did not finish within {AGENT_RUN_TIMEOUT:g}s. Check your tasks before retrying."
+    return (
+        f"Sorry, the agent did not finish within {AGENT_RUN_TIMEOUT:g}s. Changes made so far are saved; "
+        "retry with the same Idempotency-Key to finish without repeating them."
+    )
+
+def chat_with_agent(message: str, session_id: Optional[str] = None, idempotency_key: Optional[str] = None):
     """Chat with the todo list agent"""
+    run = RunKeys(idempotency_key, message) if idempotency_key else None
+    token = current_run.set(run)
+    order_token = call_order.set(CallOrder())
     try:
-        response = agent.run(message, stream=False)
-        return getattr(response, "content", str(response))
+        routed = fast_path(message)
+        if routed:
+            return routed[2]
+        reply, version = cached_reply(message, session_id)
+        if reply is not None:
+            return reply
+        reply = recorded_reply(run)
+        if reply is not None:
+            return reply
+        agent, _ = sessions.get(session_id)
+        start = time.perf_counter()
+        # the tools are async, so the blocking entry point drives the async run too
+        response = asyncio.run(asyncio.wait_for(
+            agent.arun(message, stream=False, refresh_session_before_write=REFRESH_SESSION),
+            AGENT_RUN_TIMEOUT or None,
+        ))
+        record_run("sync", time.perf_counter() - start, getattr(response, "metrics", None))
+        reply = getattr(response, "content", str(response))
+        record_reply(run, reply)
+        remember_reply(message, session_id, version, reply, run_tool_calls(response))
+        return reply
+    except asyncio.TimeoutError:
+        agent_errors.inc("sync")
+        logger.warning("Agent run timed out after %gs", AGENT_RUN_TIMEOUT)
+        return timeout_reply(run)
     except Exception as e:
+        agent_errors.inc("sync")
+        logger.exception("Agent run failed")
         return f"Sorry, something went wrong: {str(e)}"
+    finally:
+        call_order.reset(order_token)
+        current_run.reset(token)
+
+async def achat_with_agent(
+    message: str, session_id: Optional[str] = None, client: Hashable = "", idempotency_key: Optional[str] = None
+):
+    """Chat with the todo list agent without blocking the event loop.
+
+    LLM runs are admitted through chat_admission as `client`; raises Rejected
+    when the client is over its rate, the queue is full or the wait times out.
+    Fast-path commands and cached replies are not admitted and never rejected. With an idempotency key, a
+    retry of the same message replays the writes and the reply of earlier
+    attempts instead of repeating them.
+    """
+    run = RunKeys(idempotency_key, message) if idempotency_key else None
+    token = current_run.set(run)
+    order_token = call_order.set(CallOrder())
+    try:
+        routed = await asyncio.to_thread(fast_path, message)
+        if routed:
+            return routed[2]
+        reply, version = await asyncio.to_thread(cached_reply, message, session_id)
+        if reply is not None:
+            return reply
+        await aload_agent_stack()
+
+        async def llm_run() -> Tuple[str, bool]:
+            # checked here rather than before coalescing, so a retry that waited
+            # for its own first attempt picks up the reply that attempt recorded
+            reply = await asyncio.to_thread(recorded_reply, run)
+            if reply is not None:
+                return reply, False
+            agent, lock = sessions.get(session_id)
+            # runs within one session are serialized; different sessions run concurrently
+            async with lock, chat_admission.slot(client):
+                start = time.perf_counter()
+                response = await asyncio.wait_for(
+                    agent.arun(message, stream=False, refresh_session_before_write=REFRESH_SESSION),
+                    AGENT_RUN_TIMEOUT or None,
+                )
+                record_run("async", time.perf_counter() - start, getattr(response, "metrics", None))
+            reply = getattr(response, "content", str(response))
+            await asyncio.to_thread(record_reply, run, reply)
+            return reply, await asyncio.to_thread(
+                remember_reply, message, session_id, version, reply, run_tool_calls(response)
+            )
+
+        # the same message already on its way to the LLM in this session is waited for, not sent again
+        flight = (current_owner.get(), session_id or DEFAULT_SESSION_ID, normalize_message(message))
+        # only the run that goes to the LLM spends a rate-limit token
+        return await chat_admission.coalesce(flight, client, llm_run)
+    except Rejected:
+        raise
+    except asyncio.TimeoutError:
+        agent_errors.inc("async")
+        logger.warning("Agent run timed out after %gs", AGENT_RUN_TIMEOUT)
+        return timeout_reply(run)
+    except Exception as e:
+        agent_errors.inc("async")
+        logger.exception("Agent run failed")
+        return f"Sorry, something went wrong: {str(e)}"
+    finally:
+        call_order.reset(order_token)
+        current_run.reset(token)
+
+async def with_deadline(events: AsyncIterator[Any], seconds: float) -> AsyncIterator[Any]:
+    """Items of `events`, raising asyncio.TimeoutError once `seconds` have passed (0: no limit)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds if seconds > 0 else None
+    while True:
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - loop.time())
+            event = await asyncio.wait_for(events.__anext__(), remaining)
+        except StopAsyncIteration:
+            return
+        yield event
+
+async def stream_chat_with_agent(
+    message: str, session_id: Optional[str] = None, client: Hashable = "", idempotency_key: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream an agent run as token, tool_call, tool_result, error and done events"""
+    run = RunKeys(idempotency_key, message) if idempotency_key else None
+    token = current_run.set(run)
+    order_token = call_order.set(CallOrder())
+    try:
+        routed = await asyncio.to_thread(fast_path, message)
+        if routed:
+            tool_name, kwargs, reply = routed
+            yield {"type": "tool_call", "name": tool_name, "args": kwargs}
+            yield {"type": "token", "content": reply}
+            yield {"type": "done"}
+            return
+        reply, version = await asyncio.to_thread(cached_reply, message, session_id)
+        if reply is None:
+            reply = await asyncio.to_thread(recorded_reply, run)
+        if reply is not None:
+            yield {"type": "token", "content": reply}
+            yield {"type": "done"}
+            return
+        chat_admission.check(client)
+        await aload_agent_stack()
+        from agno.run.response import RunEvent
+
+        chunks: List[str] = []
+        tool_calls: List[Tuple[str, Dict[str, Any]]] = []
+        failed = False
+        agent, lock = sessions.get(session_id)
+        async with lock, chat_admission.slot(client):
+            start = time.perf_counter()
+            events = await agent.arun(
+                message, stream=True, stream_intermediate_steps=True,
+                refresh_session_before_write=REFRESH_SESSION,
+            )
+            async for event in with_deadline(events, AGENT_RUN_TIMEOUT):
+                kind = getattr(event, "event", None)
+                if kind == RunEvent.run_response_content.value:
+                    if event.content:
+                        chunks.append(str(event.content))
+                        yield {"type": "token", "content": chunks[-1]}
+                elif kind == RunEvent.tool_call_started.value and event.tool:
+                    tool_calls.append((event.tool.tool_name, event.tool.tool_args or {}))
+                    yield {"type": "tool_call", "name": event.tool.tool_name, "args": event.tool.tool_args or {}}
+                elif kind == RunEvent.tool_call_completed.value and event.tool:
+                    yield {"type": "tool_result", "name": event.tool.tool_name, "result": event.tool.result}
+                elif kind == RunEvent.run_error.value:
+                    failed = True
+                    yield {"type": "error", "message": str(event.content)}
+            run_response = getattr(agent, "run_response", None)
+            record_run("stream", time.perf_counter() - start, getattr(run_response, "metrics", None))
+        if failed:
+            agent_errors.inc("stream")
+        else:
+            await asyncio.to_thread(record_reply, run, "".join(chunks))
+            await asyncio.to_thread(remember_reply, message, session_id, version, "".join(chunks), tool_calls)
+    except Rejected as e:
+        # the response has started, so the 429/503 becomes an error event
+        yield {"type": "error", "message": e.detail, "retry_after": e.retry_after}
+    except asyncio.TimeoutError:
+        agent_errors.inc("stream")
+        logger.warning("Agent stream timed out after %gs", AGENT_RUN_TIMEOUT)
+        yield {"type": "error", "message": timeout_reply(run)}
+    except Exception as e:
+        agent_errors.inc("stream")
+        logger.exception("Agent stream failed")
+        yield {"type": "error", "message": f"Sorry, something went wrong: {str(e)}"}
+    finally:
+        call_order.reset(order_token)
+        current_run.reset(token)
+    yield {"type": "done"}
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the Todo List Agent API
+
+Runs the FastAPI app in-process against a scratch SQLite database, replaces the
+Gemini model with the deterministic MockLLM from mock_llm.py, and drives the
+REST and chat endpoints at a configurable concurrency. Reports p50/p95/p99
+latency, requests/sec and time spent in each models.py function, and compares
+the run against a stored baseline. It also cold-imports main.py in a fresh
+interpreter and fails the budget check if that takes longer than
+--import-budget seconds or loads the agent stack (agno, Gemini client).
+
+    python benchmark.py                       # run and compare to benchmark_baseline.json
+    python benchmark.py --save-baseline       # run and overwrite the baseline
+    python benchmark.py --tasks 100000 --concurrency 64 --scenarios list,chat
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "benchmark_baseline.json")
+SCENARIOS = ("list", "list_page", "add", "update", "delete", "chat")
+# modules that must stay out of a CRUD-only import of main.py; agent.py loads them on first chat
+AGENT_STACK_MODULES = ("agno", "google.genai")
+
+# A mix of fast-path commands, repeated read-only questions (cache hits once warm)
+# and messages that need the (mock) LLM plus one or more tool calls.
+CHAT_MESSAGES = [
+    "show my tasks",
+    "what is left for today?",
+    "add 'Benchmark task'",
+    "find groceries",
+    "mark task 3 as done",
+    "done with 5",
+    "hello there",
+    "which tasks are pending?",
+    "finish 7; reopen 8 then list tasks",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10_000, help="rows to seed into the tasks table")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds the mock LLM waits per call")
+    parser.add_argument("--sessions", type=int, default=8, help="distinct chat session ids")
+    parser.add_argument("--no-fast-path", action="store_true", help="send every chat message to the LLM")
+    parser.add_argument("--no-cache", action="store_true", help="disable the agent reply cache")
+    parser.add_argument("--prompt-style", choices=("compact", "full"), default="full", help="agent instructions and tool descriptions to send")
+    parser.add_argument("--rate-limit", type=float, default=0, help="chat requests/s per client (0: no limit, as every request comes from one client)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression before flagging")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any metric regressed")
+    parser.add_argument("--json", dest="json_out", help="also write the full report to this file")
+    parser.add_argument("--import-budget", type=float, default=1.0, help="max seconds for a cold `import main` (0 disables)")
+    parser.add_argument("--import-runs", type=int, default=3, help="cold imports to time; the fastest counts")
+    return parser.parse_args()
+
+
+# --- measurement helpers ---
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class DbTimer:
+    """Wraps the public functions of models.py and accumulates wall time per function."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    def _record(self, name: str, elapsed: float) -> None:
+        with self._lock:
+            self.calls[name] += 1
+            self.seconds[name] += elapsed
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        if inspect.isgeneratorfunction(fn):
+            @wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    yield from fn(*args, **kwargs)
+                finally:
+                    self._record(name, time.perf_counter() - start)
+            return gen_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(name, time.perf_counter() - start)
+        return wrapper
+
+    def instrument(self, module) -> None:
+        for name in module.__all__:
+            setattr(module, name, self.wrap(name, getattr(module, name)))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.seconds.clear()
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "calls": self.calls[name],
+                    "total_ms": round(self.seconds[name] * 1000, 2),
+                    "mean_ms": round(self.seconds[name] * 1000 / self.calls[name], 3),
+                }
+                for name in sorted(self.calls)
+            }
+
+
+async def drive(
+    total: int, concurrency: int, request: Callable[[int], Awaitable[Any]]
+) -> Dict[str, Any]:
+    """Issue `total` requests from `concurrency` workers; request(i) must raise on failure."""
+    latencies: List[float] = []
+    errors = 0
+    next_index = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                await request(i)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+# --- scenarios ---
+
+def build_scenarios(client, args, seeded_ids: List[int]) -> Dict[str, Callable[[int], Awaitable[Any]]]:
+    rng = random.Random(args.seed)
+    first_new_id = (max(seeded_ids) if seeded_ids else 0) + 1_000_000
+
+    async def ok(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response
+
+    async def list_all(i):
+        await ok(await client.get("/"))
+
+    async def list_page(i):
+        await ok(await client.get("/", params={"limit": 50, "status": "false"}))
+
+    async def add(i):
+        await ok(await client.post("/add", json={
+            "id": first_new_id + i, "name": f"bench {i}", "description": "", "status": False,
+        }))
+
+    async def update(i):
+        task_id = rng.choice(seeded_ids)
+        await ok(await client.put(f"/update/{task_id}", json={
+            "id": task_id, "name": f"updated {i}", "description": "benchmark", "status": bool(i % 2),
+        }))
+
+    async def delete(i):
+        # removes the rows created by the "add" scenario
+        await ok(await client.delete(f"/delete/{first_new_id + i}"))
+
+    async def chat(i):
+        response = await ok(await client.post("/agent/chat", json={
+            "message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)],
+            "session_id": f"bench-{i % args.sessions}",
+        }))
+        if response.json().get("reply", "").startswith("Sorry, something went wrong"):
+            raise RuntimeError(response.json()["reply"])
+
+    return {"list": list_all, "list_page": list_page, "add": add, "update": update, "delete": delete, "chat": chat}
+
+
+# --- startup ---
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+print(json.dumps({"seconds": time.perf_counter() - start, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure_import(runs: int, workdir: str) -> Dict[str, Any]:
+    """Time `import main` in fresh interpreters, each against a new scratch database"""
+    timings: List[float] = []
+    loaded: List[str] = []
+    for i in range(max(1, runs)):
+        env = dict(os.environ, TODO_DB_PATH=os.path.join(workdir, f"import-{i}.db"))
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE % (AGENT_STACK_MODULES,)],
+            cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        probe = json.loads(out.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        loaded = probe["loaded"]
+    return {"import_main_ms": round(min(timings) * 1000, 1), "agent_stack_loaded": loaded}
+
+
+def check_startup(startup: Dict[str, Any], budget: float) -> List[str]:
+    problems = []
+    if budget > 0 and startup["import_main_ms"] > budget * 1000:
+        problems.append(f"import main took {startup['import_main_ms']:g} ms (budget {budget * 1000:g} ms)")
+    if startup["agent_stack_loaded"]:
+        problems.append("import main loaded " + ", ".join(startup["agent_stack_loaded"]))
+    return problems
+
+
+# --- baseline comparison ---
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    print("\nCompared to baseline:")
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        parts = []
+        for metric, higher_is_better in (("p50_ms", False), ("p95_ms", False), ("rps", True)):
+            old, new = previous.get(metric), current.get(metric)
+            if not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > tolerance else ""
+            if flag:
+                regressions.append(f"{name}.{metric}")
+            parts.append(f"{metric} {old:g} -> {new:g} ({change:+.0%}){flag}")
+        print(f"  {name:<10} " + ", ".join(parts))
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    print(
+        f"\n{config['tasks']} seeded tasks, {config['requests']} requests/scenario, "
+        f"concurrency {config['concurrency']}, mock LLM latency {config['llm_latency']}s"
+    )
+    print(f"\n{'scenario':<10} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, r in report["scenarios"].items():
+        print(f"{name:<10} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+    print(f"\n{'models.py function':<22} {'calls':>7} {'total ms':>10} {'mean ms':>9}")
+    for name, r in report["sqlite"].items():
+        print(f"{name:<22} {r['calls']:>7} {r['total_ms']:>10} {r['mean_ms']:>9}")
+    startup = report.get("startup")
+    if startup:
+        print(f"\nimport main: {startup['import_main_ms']} ms cold")
+    prompt = report.get("agent", {}).get("prompt")
+    if prompt and prompt["runs"]:
+        print(f"\n{'prompt tokens/run':<18} {'sent':>8} {'saved':>8}   ({prompt['runs']} LLM runs, {report['config']['prompt_style']} prompt, estimated)")
+        for component, sent in prompt["tokens_per_run"].items():
+            print(f"{component:<18} {sent:>8} {prompt['saved_per_run'][component]:>8}")
+    agent_stats = report.get("agent", {})
+    if agent_stats:
+        print("\nagent: " + json.dumps(agent_stats))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    # models must be instrumented before agent/main import its functions by name
+    import models
+    timer = DbTimer()
+    timer.instrument(models)
+
+    import agent
+    from mock_llm import MockLLM
+    agent.llm = MockLLM(latency=args.llm_latency)
+    agent.sessions.clear()
+    agent.FAST_PATH_ENABLED = not args.no_fast_path
+    if args.no_cache:
+        agent.reply_cache.max_entries = 0
+    agent.chat_admission.buckets.rate = args.rate_limit
+    agent.PROMPT_STYLE = args.prompt_style
+    import main as server
+
+    seeded = models.insert_tasks(
+        [{"name": f"task {i}", "description": "seeded", "status": i % 3 == 0} for i in range(args.tasks)]
+    )
+    seeded_ids = [t["id"] for t in seeded] or [1]
+    timer.reset()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    transport = httpx.ASGITransport(app=server.app)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        requests = build_scenarios(client, args, seeded_ids)
+        for name in scenarios:
+            results[name] = await drive(args.requests, args.concurrency, requests[name])
+
+    stats = server.agent_stats() if hasattr(server, "agent_stats") else {}
+    return {
+        "config": {
+            "tasks": args.tasks,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "fast_path": not args.no_fast_path,
+            "cache": not args.no_cache,
+            "rate_limit": args.rate_limit,
+            "prompt_style": args.prompt_style,
+        },
+        "scenarios": results,
+        "sqlite": timer.report(),
+        "agent": stats,
+        "startup": measure_import(args.import_runs, os.path.dirname(os.environ["TODO_DB_PATH"])),
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    # isolate the benchmark from the real todos.db; must happen before models is imported
+    workdir = tempfile.mkdtemp(prefix="todo-bench-")
+    os.environ["TODO_DB_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, BASE_DIR)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    # the import budget is absolute, so it is checked even when saving a baseline
+    over_budget = check_startup(report["startup"], args.import_budget)
+    for problem in over_budget:
+        print(f"\nStartup budget exceeded: {problem}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 1 if over_budget and args.fail_on_regression else 0
+
+    regressions: List[str] = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+    if (regressions or over_budget) and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# cache.py - TTL + LRU cache for agent replies
+#
+# Entries are keyed on the owner, the chat session, the normalized message and
+# the task-table data version (models.get_data_version), so any
+# create/update/delete makes older entries unreachable; they then age out
+# through TTL or LRU eviction. agent.py decides which replies may be stored.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+AGENT_CACHE_SIZE = int(os.getenv("AGENT_CACHE_SIZE", "512"))
+AGENT_CACHE_TTL = float(os.getenv("AGENT_CACHE_TTL", "300"))
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(message.lower().split()).rstrip(".!? ")
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries expire `ttl` seconds after being stored."""
+
+    def __init__(self, max_entries: int = AGENT_CACHE_SIZE, ttl: float = AGENT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+reply_cache = ResponseCache()
@@ -0,0 +1,12 @@
+# conftest.py - shared pytest setup for the agent's tests
+#
+# models.py binds to TODO_DB_PATH when it is imported, so point it at a scratch
+# database before any test module imports the app; the real todos.db is never
+# touched. main.py serves static/ relative to the working directory, so tests
+# run from this folder like the app does.
+
+import os
+import tempfile
+
+os.environ.setdefault("TODO_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="todo-tests-"), "todos.db"))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
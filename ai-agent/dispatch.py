@@ -0,0 +1,91 @@
+# dispatch.py - concurrent execution of the agent's tool calls
+#
+# When one model response asks for several tools, agno awaits all of them
+# together. The tools themselves do blocking SQLite work, so each call is
+# handed to a small thread pool. The pool is bounded so a burst of tool calls
+# cannot exhaust the database connection pool. Calls that could conflict are
+# still ordered: writes to the same task id run in the order they were issued,
+# and a read waits for every write issued before it (so "add milk and show my
+# tasks" shows the milk). That ordering is per agent run: each run sets its
+# own CallOrder in `call_order`, so runs of other requests, owners and event
+# loops never wait for each other; only the thread pool is shared. Each call
+# runs in a copy of the caller's context, so it acts for the same owner.
+
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+AGENT_TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+
+# how a tool's calls interact with others
+READ, CREATE, WRITE = "read", "create", "write"
+
+
+class CallOrder:
+    """The writes in flight of one agent run; its futures belong to that run's event loop."""
+
+    def __init__(self):
+        # key -> completion of the latest write issued for it
+        self.last_write: Dict[Hashable, asyncio.Future] = {}
+        # completions of every write still in flight
+        self.writes: Set[asyncio.Future] = set()
+
+
+# set by each agent run; tool calls are ordered only against calls of the same run
+call_order: "contextvars.ContextVar[Optional[CallOrder]]" = contextvars.ContextVar("tool_call_order", default=None)
+
+
+class ToolDispatcher:
+    """Runs blocking tool functions on a bounded thread pool with per-key (e.g. task id) ordering."""
+
+    def __init__(self, max_workers: int = AGENT_TOOL_CONCURRENCY):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="agent-tool")
+        return self._executor
+
+    async def run(
+        self, fn: Callable, kwargs: Dict[str, Any], access: str = WRITE, key: Optional[Hashable] = None
+    ) -> Any:
+        # everything up to the first await runs in issue order, so dependencies
+        # are registered exactly in the order the model asked for the calls
+        loop = asyncio.get_running_loop()
+        # a call outside any run has nothing to be ordered against
+        order = call_order.get() or CallOrder()
+        done: Optional[asyncio.Future] = None
+        waits: List[asyncio.Future] = []
+        if access == READ:
+            waits = list(order.writes)
+        else:
+            done = loop.create_future()
+            order.writes.add(done)
+            if access == WRITE and key is not None:
+                previous = order.last_write.get(key)
+                if previous is not None:
+                    waits.append(previous)
+                order.last_write[key] = done
+        try:
+            if waits:
+                await asyncio.wait(waits)
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._pool(), partial(context.run, fn, **kwargs))
+        finally:
+            if done is not None:
+                done.set_result(None)
+                order.writes.discard(done)
+                if key is not None and order.last_write.get(key) is done:
+                    del order.last_write[key]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+dispatcher = ToolDispatcher()
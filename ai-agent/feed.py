@@ -0,0 +1,77 @@
+# feed.py - live change notifications for GET /changes/stream
+#
+# One background task polls models.get_data_version() while at least one
+# client is subscribed and wakes every waiting stream when the version moves.
+# Polling the counter (instead of hooking the write paths) also catches writes
+# made by the agent's tools and by other processes sharing the database.
+# Each owner has its own feed, polling that owner's data version.
+
+import asyncio
+import os
+from typing import Dict, Optional
+
+from models import get_data_version
+from task_repository import current_owner
+
+CHANGE_POLL_INTERVAL = float(os.getenv("CHANGE_POLL_INTERVAL", "0.25"))
+CHANGE_HEARTBEAT = float(os.getenv("CHANGE_HEARTBEAT", "15"))
+
+
+class ChangeFeed:
+    """Shares a single data-version poller between all subscribed streams."""
+
+    def __init__(self, owner: str = "", interval: float = CHANGE_POLL_INTERVAL):
+        self.owner = owner
+        self.interval = interval
+        self.version = 0
+        self.subscribers = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._poller: Optional[asyncio.Task] = None
+
+    async def _poll(self) -> None:
+        # the poller task runs in its own copy of the context
+        current_owner.set(self.owner)
+        while self.subscribers:
+            version = await asyncio.to_thread(get_data_version)
+            if version != self.version:
+                self.version = version
+                async with self._condition:
+                    self._condition.notify_all()
+            await asyncio.sleep(self.interval)
+
+    def subscribe(self) -> None:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        self.subscribers += 1
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+
+    def unsubscribe(self) -> None:
+        self.subscribers = max(0, self.subscribers - 1)
+
+    async def wait(self, since: int, timeout: float = CHANGE_HEARTBEAT) -> bool:
+        """Wait until the data version passes `since`; False on timeout"""
+        async with self._condition:
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self.version > since), timeout
+                )
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+
+class ChangeFeeds:
+    """One ChangeFeed per owner, created on first subscription."""
+
+    def __init__(self):
+        self._feeds: Dict[str, ChangeFeed] = {}
+
+    def get(self, owner: str) -> ChangeFeed:
+        feed = self._feeds.get(owner)
+        if feed is None:
+            feed = self._feeds[owner] = ChangeFeed(owner)
+        return feed
+
+
+change_feeds = ChangeFeeds()
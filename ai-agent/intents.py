@@ -0,0 +1,117 @@
+# intents.py - rule-based fast path for simple chat commands
+#
+# Messages like "show my tasks" or "mark task 3 as done" map directly onto one
+# tool call, so they are answered without an LLM round trip. Anything that does
+# not match a rule exactly falls through to the agent.
+
+import re
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+_POLITE = r"(?:please\s+|pls\s+|can you\s+|could you\s+)?"
+_END = r"\s*(?:please)?\s*[.!?]*\s*$"
+_TASKS = r"(?:tasks?|todos?|to-?dos?|todo list|task list|list)"
+_ID = r"#?(?P<task_id>\d+)"
+
+# (intent name, tool name, compiled pattern, fixed tool kwargs)
+INTENT_RULES = [
+    (
+        "show_tasks", "show_tasks",
+        re.compile(
+            rf"^{_POLITE}(?:show|list|display|view|get)(?:\s+me)?(?:\s+all)?(?:\s+(?:of\s+)?my)?\s+{_TASKS}{_END}"
+            rf"|^what(?:'s| is| are)\s+(?:on\s+)?my\s+{_TASKS}{_END}",
+            re.IGNORECASE,
+        ),
+        {},
+    ),
+    (
+        "show_pending", "show_tasks",
+        re.compile(
+            rf"^{_POLITE}(?:show|list|display|view|get)(?:\s+me)?(?:\s+all)?(?:\s+my)?\s+"
+            rf"(?:pending|open|active|incomplete|unfinished)\s+{_TASKS}{_END}",
+            re.IGNORECASE,
+        ),
+        {"status": "pending"},
+    ),
+    (
+        "show_done", "show_tasks",
+        re.compile(
+            rf"^{_POLITE}(?:show|list|display|view|get)(?:\s+me)?(?:\s+all)?(?:\s+my)?\s+"
+            rf"(?:done|completed|finished)\s+{_TASKS}{_END}",
+            re.IGNORECASE,
+        ),
+        {"status": "done"},
+    ),
+    (
+        "mark_complete", "mark_task_complete",
+        re.compile(
+            rf"^{_POLITE}(?:mark|set)\s+task\s+{_ID}\s+(?:as\s+)?(?:complete|completed|done|finished){_END}",
+            re.IGNORECASE,
+        ),
+        {},
+    ),
+    (
+        "mark_complete", "mark_task_complete",
+        re.compile(rf"^{_POLITE}(?:complete|finish)\s+task\s+{_ID}{_END}", re.IGNORECASE),
+        {},
+    ),
+    (
+        "mark_pending", "mark_task_pending",
+        re.compile(
+            rf"^{_POLITE}(?:mark|set)\s+task\s+{_ID}\s+(?:as\s+)?(?:pending|not\s+done|incomplete|undone|open){_END}",
+            re.IGNORECASE,
+        ),
+        {},
+    ),
+    (
+        "remove_task", "remove_task",
+        re.compile(rf"^{_POLITE}(?:delete|remove)\s+task\s+{_ID}{_END}", re.IGNORECASE),
+        {},
+    ),
+]
+
+
+def match_intent(message: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """Return (intent, tool name, tool kwargs) for an unambiguous command, else None"""
+    text = " ".join(message.split())
+    for intent, tool_name, pattern, fixed in INTENT_RULES:
+        m = pattern.match(text)
+        if not m:
+            continue
+        kwargs = dict(fixed)
+        task_id = m.groupdict().get("task_id")
+        if task_id is not None:
+            kwargs["task_id"] = int(task_id)
+        return intent, tool_name, kwargs
+    return None
+
+
+class RouterStats:
+    """Thread-safe hit/miss counters for the fast path."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.by_intent: Dict[str, int] = {}
+
+    def record(self, intent: Optional[str]) -> None:
+        with self._lock:
+            if intent is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.by_intent[intent] = self.by_intent.get(intent, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "by_intent": dict(self.by_intent),
+            }
+
+
+router_stats = RouterStats()
@@ -1,75 +1,341 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import io
+import json
+import logging
+import tempfile
+from typing import List, Literal, Optional, Tuple
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from agent import chat_with_agent
-from models import get_all_tasks, delete_task, init_db, add_task, update_task
+from pydantic import BaseModel, Field
+from agent import achat_with_agent, stream_chat_with_agent
+from admission import Rejected, chat_admission
+from intents import router_stats
+from cache import reply_cache
+from prompt import prompt_stats
+from metrics import REGISTRY, Gauge, MetricsMiddleware
+from feed import change_feeds, CHANGE_HEARTBEAT
+from models import (
+    delete_task, init_db, add_task, insert_task, update_task, list_tasks_json, iter_tasks,
+    search_tasks, apply_batch, get_data_version, get_epoch, changes_since, import_tasks, export_tasks,
+)
+from task_repository import (
+    DEFAULT_PAGE_SIZE, MAX_BATCH_SIZE, MAX_PAGE_SIZE, MEDIA_TYPES, OwnerMiddleware, current_owner, dumps,
+    import_rows, read_rows, write_rows,
+)
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 init_db()
 
+# every request acts for the owner in its X-Owner header (the default owner if
+# absent); added first so it runs inside CORS and its 400s carry CORS headers
+app.add_middleware(OwnerMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # dev-friendly; tighten for prod
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Data-Version"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+REGISTRY.register(Gauge(
+    "agent_fast_path_total", "Chat messages answered by (hit) or passed through (miss) the fast path",
+    ["result"], lambda: {("hit",): router_stats.hits, ("miss",): router_stats.misses},
+    kind="counter",
+))
+REGISTRY.register(Gauge(
+    "agent_reply_cache_total", "Agent reply cache lookups and evictions",
+    ["result"], lambda: {
+        ("hit",): reply_cache.hits, ("miss",): reply_cache.misses, ("eviction",): reply_cache.evictions,
+    },
+    kind="counter",
+))
+
+REGISTRY.register(Gauge(
+    "agent_admission_total", "Chat requests admitted to the LLM, coalesced or turned away (429/503)",
+    ["result"], lambda: {(name,): count for name, count in chat_admission.counts.items()},
+    kind="counter",
+))
+REGISTRY.register(Gauge(
+    "agent_admission_queue", "LLM runs in progress and waiting for a slot",
+    ["state"], lambda: {("running",): chat_admission.queue.running, ("waiting",): chat_admission.queue.waiting},
+))
+
+REGISTRY.register(Gauge(
+    "agent_prompt_tokens_total", "Estimated prompt tokens sent to the model, by prompt component",
+    ["component"], lambda: {(c,): n for c, n in prompt_stats.sent.items()},
+    kind="counter",
+))
+REGISTRY.register(Gauge(
+    "agent_prompt_tokens_saved_total", "Estimated prompt tokens saved by the compact prompt and history trimming",
+    ["component"], lambda: {(c,): n for c, n in prompt_stats.saved.items()},
+    kind="counter",
+))
+
+@app.exception_handler(Rejected)
+async def rejected_handler(request: Request, exc: Rejected):
+    return JSONResponse(
+        status_code=exc.status, content={"detail": exc.detail}, headers={"Retry-After": str(exc.retry_after)}
+    )
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 class AgentRequest(BaseModel):
     message: str
+    session_id: Optional[str] = Field(None, max_length=128)
 
 class Todo(BaseModel):
-    id: int
+    id: Optional[int] = None
     name: str
     description: str
     status: bool
 
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[bool] = None
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    atomic: bool = False
+
+# CRUD handlers are plain `def` so FastAPI runs them in its worker threadpool;
+# the pooled SQLite calls in models.py then never block the event loop.
 @app.get("/")
-async def root():
-    return {"tasks": get_all_tasks()}
+def root(
+    status: Optional[bool] = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    if_none_match: Optional[str] = Header(None),
+):
+    # the data version is read before the rows, so a write in between can only
+    # make the body newer than its ETag, never older
+    version = get_data_version()
+    epoch = get_epoch()
+    # versions are per owner (sharded, memory) or per file (shared), so the
+    # owner is part of the tag and caches must key on X-Owner; the epoch keeps
+    # an in-memory store that restarted at version 0 from matching old tags
+    etag = f'"{current_owner.get()}.{epoch}.{version}"'
+    headers = {"ETag": etag, "X-Data-Version": str(version), "X-Data-Epoch": str(epoch), "Vary": "X-Owner"}
+    if if_none_match and etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    if format == "ndjson":
+        rows = iter_tasks(status=status, after_id=cursor)
+        return StreamingResponse(
+            (dumps(task) + b"\n" for task in rows),
+            media_type="application/x-ndjson",
+            headers=headers,
+        )
+    # the page arrives already encoded as a JSON array and is spliced into the
+    # envelope as bytes, bypassing FastAPI's per-row jsonable_encoder pass
+    if limit is None and (cursor is not None or status is not None):
+        limit = DEFAULT_PAGE_SIZE
+    tasks, next_cursor = list_tasks_json(status=status, after_id=cursor, limit=limit)
+    body = b'{"tasks":' + tasks + b',"next_cursor":' + dumps(next_cursor) + b"}"
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/search")
+def search(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)):
+    return {"tasks": search_tasks(q, limit=limit)}
+
+def changes_after(since: int, epoch: Optional[int] = None) -> dict:
+    """changes_since() plus the epoch; a `since` from another epoch gets reset=True"""
+    current = get_epoch()
+    if epoch is not None and epoch != current:
+        return {"epoch": current, "version": get_data_version(), "reset": True, "changes": []}
+    return {"epoch": current, **changes_since(since)}
+
+@app.get("/changes")
+def changes(since: int = Query(..., ge=0), epoch: Optional[int] = Query(None, ge=0)):
+    """Tasks changed after data version `since` (the X-Data-Version of an earlier GET /,
+    sent with its X-Data-Epoch)"""
+    return changes_after(since, epoch)
+
+def chat_client(request: Request) -> Tuple[str, str]:
+    """Who a chat request is rate limited and queued as: its address and owner.
+
+    X-Owner alone is chosen by the caller, so a new value per request would
+    get a fresh bucket each time; the address pins the bucket down.
+    """
+    return (request.client.host if request.client else "", current_owner.get())
 
 @app.post("/agent/chat")
-async def chat(req: AgentRequest):
+async def chat(req: AgentRequest, request: Request, idempotency_key: Optional[str] = Header(None, max_length=128)):
+    """Send the same Idempotency-Key when retrying: writes and replies of earlier attempts are replayed"""
+    client = chat_client(request)
     try:
-        reply = chat_with_agent(req.message)
+        reply = await achat_with_agent(req.message, req.session_id, client, idempotency_key)
         return {"reply": reply}
+    except Rejected:
+        raise
     except Exception as e:
-        print(f"Error in chat endpoint: {str(e)}")
+        logger.exception("Error in chat endpoint")
         return {"reply": f"Sorry, something went wrong: {str(e)}"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/agent/stats")
+def agent_stats():
+    return {
+        "router": router_stats.snapshot(), "cache": reply_cache.snapshot(), "admission": chat_admission.snapshot(),
+        "prompt": prompt_stats.snapshot(),
+    }
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.post("/agent/chat/stream")
+async def chat_stream(
+    req: AgentRequest, request: Request, idempotency_key: Optional[str] = Header(None, max_length=128)
+):
+    """Server-Sent Events: token, tool_call, tool_result, error and a final done event"""
+    client = chat_client(request)
+
+    async def events():
+        async for event in stream_chat_with_agent(req.message, req.session_id, client, idempotency_key):
+            yield _sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/changes/stream")
+async def changes_stream(
+    since: Optional[int] = Query(None, ge=0),
+    epoch: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-Sent Events: a `changes` event (same body as GET /changes) after every write"""
+    # event ids are "<epoch>.<version>"; a bare version is accepted too
+    if last_event_id:
+        event_epoch, _, event_version = last_event_id.rpartition(".")
+        if event_version.isdigit() and (not event_epoch or event_epoch.isdigit()):
+            since, epoch = int(event_version), int(event_epoch) if event_epoch else None
+    if since is None:
+        since = await asyncio.to_thread(get_data_version)
+
+    change_feed = change_feeds.get(current_owner.get())
+
+    async def events():
+        version, current = since, epoch
+        change_feed.subscribe()
+        try:
+            # catch up first in case the client's version is already behind
+            changed = True
+            while True:
+                if changed:
+                    delta = await asyncio.to_thread(changes_after, version, current)
+                    if delta["changes"] or delta["reset"]:
+                        yield f"id: {delta['epoch']}.{delta['version']}\n" + _sse({"type": "changes", **delta})
+                    version, current = delta["version"], delta["epoch"]
+                else:
+                    yield ": keepalive\n\n"
+                changed = await change_feed.wait(version, CHANGE_HEARTBEAT)
+        finally:
+            change_feed.unsubscribe()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @app.delete("/delete/{task_id}")
-async def delete_task_endpoint(task_id: int):
+def delete_task_endpoint(task_id: int):
     try:
         result = delete_task(task_id)
         return {"message": result}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
-    except Exception as e:
-        print(f"Error in delete_task_endpoint: {str(e)}")
+    except Exception:
+        logger.exception("Error in delete_task_endpoint")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.post("/add")
-async def add_task_endpoint(task: Todo):
+def add_task_endpoint(task: Todo):
+    """Add a task; leave out the id to have one allocated atomically (safe across workers)"""
     try:
+        if task.id is None:
+            created = insert_task(task.name, task.description, task.status)
+            return {"message": f"Task {created['id']} added.", "task": created}
         result = add_task(task.id, task.name, task.description, task.status)
         return {"message": result}
     except Exception as e:
-        print(f"Error in add_task_endpoint: {str(e)}")
+        logger.warning("Error in add_task_endpoint: %s", e)
         raise HTTPException(status_code=400, detail=f"Failed to add task: {str(e)}")
 
 
+def _import_file(upload, format: str) -> int:
+    lines = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    return import_rows(import_tasks, read_rows(lines, format))
+
+@app.post("/import")
+async def import_endpoint(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+):
+    """Load tasks from a CSV (header row: name,description,status[,id]) or JSONL body.
+
+    The body is spooled to a temporary file as it arrives and then parsed and
+    written in a worker thread, one transaction per chunk of rows, so memory
+    use does not grow with the upload.
+    """
+    format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    with tempfile.TemporaryFile() as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            imported = await asyncio.to_thread(_import_file, upload, format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return {"imported": imported, "version": await asyncio.to_thread(get_data_version)}
+
+@app.get("/export")
+def export_endpoint(format: str = Query("jsonl", pattern="^(csv|jsonl)$")):
+    """Every task as CSV or JSONL, streamed from one read snapshot"""
+    return StreamingResponse(
+        write_rows(export_tasks(), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+    )
+
 @app.put("/update/{task_id}")
-async def update_task_endpoint(task_id: int, task: Todo):
+def update_task_endpoint(task_id: int, task: Todo):
     try:
         result = update_task(task_id, task.name, task.description, task.status)
         return {"message": result}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
-    except Exception as e:
-        print(f"Error in update_task_endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+    except Exception:
+        logger.exception("Error in update_task_endpoint")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.post("/batch")
+def batch_endpoint(req: BatchRequest):
+    """Apply operations in order in one transaction; atomic batches are all-or-nothing (409 on failure)"""
+    try:
+        result = apply_batch([op.model_dump(exclude_none=True) for op in req.operations], atomic=req.atomic)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        logger.exception("Error in batch_endpoint")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if not result["committed"]:
+        raise HTTPException(status_code=409, detail=result)
+    return result
@@ -0,0 +1,263 @@
+# metrics.py - in-process counters and latency histograms in Prometheus text format
+#
+# Deliberately dependency-free: a handful of metric families is all the service
+# needs, and GET /metrics renders them in the text exposition format that
+# Prometheus (or `curl`) can read directly.
+
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: Any) -> str:
+    """A label value as the text format requires: backslash, quote and newline escaped"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: Any, amount: float = 1) -> None:
+        key = tuple(str(v) for v in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[LabelValues, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: Any) -> None:
+        key = tuple(str(v) for v in label_values)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *label_values: Any) -> "_Timer":
+        return _Timer(self, label_values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    labels = _format_labels(self.labels, key, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                inf_labels = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf_labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, label_values: Tuple[Any, ...]):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+class Gauge:
+    """Metric whose samples are read from a callback at render time (e.g. existing stats objects)."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str],
+        collect: Callable[[], Dict[LabelValues, float]],
+        kind: str = "gauge",
+    ):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]))
+http_errors = REGISTRY.register(Counter(
+    "http_errors_total", "Requests that ended in an unhandled exception or a 5xx", ["method", "route"]))
+agent_run_duration = REGISTRY.register(Histogram(
+    "agent_run_duration_seconds", "End-to-end agent run latency", ["mode"]))
+llm_call_duration = REGISTRY.register(Histogram(
+    "llm_call_duration_seconds", "Latency of individual model calls within agent runs"))
+agent_tokens = REGISTRY.register(Counter(
+    "agent_tokens_total", "Model tokens consumed by agent runs", ["type"]))
+agent_errors = REGISTRY.register(Counter(
+    "agent_errors_total", "Agent runs that failed", ["mode"]))
+agent_replays = REGISTRY.register(Counter(
+    "agent_replays_total", "Retried tool calls and replies served from the outbox instead of run again", ["kind"]))
+tool_duration = REGISTRY.register(Histogram(
+    "tool_call_duration_seconds", "Agent tool latency", ["tool", "path"]))
+tool_errors = REGISTRY.register(Counter(
+    "tool_errors_total", "Agent tool calls that raised", ["tool"]))
+db_duration = REGISTRY.register(Histogram(
+    "db_call_duration_seconds", "Latency of models.py data-access functions", ["function"]))
+db_errors = REGISTRY.register(Counter(
+    "db_errors_total", "models.py calls that raised (including not-found)", ["function"]))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_request_duration.observe(time.perf_counter() - start, method, path, status)
+            if status >= 500:
+                http_errors.inc(method, path)
+
+
+def timed_db(fn: Callable) -> Callable:
+    """Decorator recording latency and errors of a data-access function"""
+    name = fn.__name__
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def gen_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                yield from fn(*args, **kwargs)
+            except Exception:
+                db_errors.inc(name)
+                raise
+            finally:
+                db_duration.observe(time.perf_counter() - start, name)
+        return gen_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            db_errors.inc(name)
+            raise
+        finally:
+            db_duration.observe(time.perf_counter() - start, name)
+    return wrapper
+
+
+async def atool_hook(function_name: str, function_call: Callable, arguments: Dict[str, Any]) -> Any:
+    """agno tool hook: times every tool call the model makes"""
+    start = time.perf_counter()
+    try:
+        return await function_call(**arguments)
+    except Exception:
+        tool_errors.inc(function_name)
+        raise
+    finally:
+        tool_duration.observe(time.perf_counter() - start, function_name, "llm")
+
+
+def observe_tool(name: str, fn: Callable, arguments: Dict[str, Any], path: str) -> Any:
+    start = time.perf_counter()
+    try:
+        return fn(**arguments)
+    except Exception:
+        tool_errors.inc(name)
+        raise
+    finally:
+        tool_duration.observe(time.perf_counter() - start, name, path)
+
+
+def record_run(mode: str, seconds: float, run_metrics: Optional[Dict[str, Any]]) -> None:
+    """Record an agent run's latency plus the per-call model timings and token counts agno collected"""
+    agent_run_duration.observe(seconds, mode)
+    if not run_metrics:
+        return
+    for llm_seconds in run_metrics.get("time") or []:
+        llm_call_duration.observe(llm_seconds)
+    for kind in ("input_tokens", "output_tokens", "cached_tokens"):
+        total = sum(run_metrics.get(kind) or [])
+        if total:
+            agent_tokens.inc(kind.replace("_tokens", ""), amount=total)
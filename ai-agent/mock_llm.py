@@ -0,0 +1,129 @@
+# mock_llm.py - deterministic, offline stand-in for the Gemini model
+#
+# Used by benchmark.py so agent runs can be measured without network access or
+# API quota. The model answers after a fixed latency; a "script" of regex rules
+# decides which tool calls it makes for a user message, and once tool results
+# come back it replies with them verbatim (which is what the real prompt asks for).
+
+import asyncio
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+
+# (pattern, tool name, argument template); templates may reference named groups
+# as "{group}" and a value of the form "int:{group}" is converted to int
+DEFAULT_SCRIPT: List[Tuple[str, str, Dict[str, str]]] = [
+    (r"(?:add|create|new task)\s+(?:a task\s+)?(?:called\s+)?['\"]?(?P<name>[^'\"]+?)['\"]?$", "create_task", {"name": "{name}"}),
+    (r"(?:finish|done with|complete)\s+(?:task\s+)?#?(?P<id>\d+)", "mark_task_complete", {"task_id": "int:{id}"}),
+    (r"(?:reopen|undo)\s+(?:task\s+)?#?(?P<id>\d+)", "mark_task_pending", {"task_id": "int:{id}"}),
+    (r"(?:drop|get rid of|remove)\s+(?:task\s+)?#?(?P<id>\d+)", "remove_task", {"task_id": "int:{id}"}),
+    (r"(?:find|search(?: for)?|look for)\s+(?P<query>.+)$", "find_tasks", {"query": "{query}"}),
+    (r"(?:what|which|anything|overview|summary|list|tasks)", "show_tasks", {}),
+]
+
+# a message is planned clause by clause, so "finish 3; drop 4 then list tasks"
+# yields three tool calls in one response
+CLAUSE_SEPARATOR = re.compile(r"\s*(?:;|\bthen\b|\balso\b)\s*", re.IGNORECASE)
+
+_call_ids = count(1)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for mock usage metrics"""
+    return max(1, len(text) // 4) if text else 0
+
+
+@dataclass
+class MockLLM(Model):
+    id: str = "mock-llm"
+    name: str = "MockLLM"
+    provider: str = "Mock"
+
+    latency: float = 0.05
+    script: List[Tuple[str, str, Dict[str, str]]] = field(default_factory=lambda: list(DEFAULT_SCRIPT))
+    fallback_reply: str = "I can help you manage your tasks."
+
+    def __post_init__(self):
+        super().__post_init__()
+        self._rules = [(re.compile(p, re.IGNORECASE), name, args) for p, name, args in self.script]
+
+    # --- scripted behaviour ---
+
+    def _plan_clause(self, text: str) -> Optional[Dict[str, Any]]:
+        for pattern, tool_name, template in self._rules:
+            m = pattern.search(text)
+            if not m:
+                continue
+            args: Dict[str, Any] = {}
+            for key, value in template.items():
+                as_int = value.startswith("int:")
+                value = (value[4:] if as_int else value).format(**m.groupdict())
+                args[key] = int(value) if as_int else value.strip()
+            return {
+                "id": f"call_{next(_call_ids)}",
+                "type": "function",
+                "function": {"name": tool_name, "arguments": json.dumps(args)},
+            }
+        return None
+
+    def _plan(self, text: str) -> List[Dict[str, Any]]:
+        calls = (self._plan_clause(clause) for clause in CLAUSE_SEPARATOR.split(text) if clause)
+        return [call for call in calls if call is not None]
+
+    def _respond(self, messages: List[Message], tools: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        prompt_tokens = sum(estimate_tokens(m.get_content_string()) for m in messages)
+        prompt_tokens += estimate_tokens(json.dumps(tools or []))
+        tool_results: List[str] = []
+        for m in reversed(messages):
+            if m.role != "tool":
+                break
+            tool_results.insert(0, m.get_content_string())
+        if tool_results:
+            content, tool_calls = "\n\n".join(tool_results), []
+        else:
+            user = next((m for m in reversed(messages) if m.role == "user"), None)
+            text = user.get_content_string() if user else ""
+            tool_calls = self._plan(text) if tools else []
+            content = None if tool_calls else self.fallback_reply
+        return {
+            "content": content,
+            "tool_calls": tool_calls,
+            "usage": {
+                "input_tokens": prompt_tokens,
+                "output_tokens": estimate_tokens(content or json.dumps(tool_calls)),
+            },
+        }
+
+    # --- agno Model interface ---
+
+    def invoke(self, messages: List[Message], tools=None, **kwargs) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        return self._respond(messages, tools)
+
+    async def ainvoke(self, messages: List[Message], tools=None, **kwargs) -> Dict[str, Any]:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages, tools)
+
+    def invoke_stream(self, messages: List[Message], tools=None, **kwargs) -> Iterator[Dict[str, Any]]:
+        yield self.invoke(messages, tools=tools)
+
+    async def ainvoke_stream(self, messages: List[Message], tools=None, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        yield await self.ainvoke(messages, tools=tools)
+
+    def parse_provider_response(self, response: Dict[str, Any], **kwargs) -> ModelResponse:
+        return ModelResponse(
+            role="assistant",
+            content=response["content"],
+            tool_calls=response["tool_calls"],
+            response_usage=response["usage"],
+        )
+
+    def parse_provider_response_delta(self, response: Dict[str, Any]) -> ModelResponse:
+        return self.parse_provider_response(response)
@@ -1,106 +1,90 @@
 # models.py (use absolute path for todos.db)
-import sqlite3
+#
+# The queries live in the shared task_repository package at the repository
+# root (also used by todo_app). This module binds it to the agent's database
+# and wraps each data-access function with timed_db for /metrics. Every
+# function acts on the current owner's tasks (the X-Owner header of the
+# request, see task_repository/tenants.py).
 import os
-from typing import List, Dict, Any
+import sys
+import threading
 
-BASE_DIR = os.path.dirname(__file__)
-DB_NAME = os.path.join(BASE_DIR, "todos.db")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))  # repository root, for task_repository
 
-def init_db() -> None:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            description TEXT DEFAULT '',
-            status INTEGER DEFAULT 0
-        )
-        """
-    )
-    conn.commit()
-    conn.close()
+from task_repository import TaskRepository, create_tenants  # noqa: E402
+from metrics import timed_db  # noqa: E402
 
-init_db()
+DB_NAME = os.getenv("TODO_DB_PATH", os.path.join(BASE_DIR, "todos.db"))
+
+tenants = create_tenants(DB_NAME)
+
+__all__ = [
+    "get_data_version", "get_epoch", "changes_since", "get_next_task_id", "get_all_tasks", "list_tasks",
+    "iter_tasks", "list_tasks_json", "count_tasks", "search_tasks", "get_task", "add_task", "insert_task",
+    "insert_tasks", "update_task", "patch_task", "set_status", "delete_task", "apply_batch",
+    "import_tasks", "export_tasks", "run_once", "get_outcome",
+]
+
+# methods returning generators; their repository is picked when called, not
+# when iterated, since a streaming response iterates in another context
+STREAMING = ("iter_tasks", "export_tasks")
 
-def _to_bool(value: Any) -> bool:
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, (int, float)):
-        return bool(value)
-    if isinstance(value, str):
-        return value.strip().lower() in ("1", "true", "yes", "done", "completed")
-    return False
+def current_repository() -> TaskRepository:
+    """The repository of the owner the current request or agent run acts for"""
+    return tenants.get()
 
-def get_next_task_id() -> int:
-    """Get the next available task ID"""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tasks")
-    max_id = cursor.fetchone()[0]
-    conn.close()
-    return max_id + 1
+def scoped(name: str):
+    """Timed module-level function calling repository method `name` for the current owner"""
+    if name in STREAMING:
+        def stream(repository, *args, **kwargs):
+            yield from getattr(repository, name)(*args, **kwargs)
+        stream.__name__ = name
+        timed = timed_db(stream)
 
-def get_all_tasks() -> List[Dict[str, Any]]:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, description, status FROM tasks ORDER BY id ASC")
-    rows = cursor.fetchall()
-    conn.close()
-    tasks: List[Dict[str, Any]] = []
-    for r in rows:
-        try:
-            tasks.append({
-                "id": int(r[0]),
-                "name": r[1] or "",
-                "description": r[2] or "",
-                "status": _to_bool(r[3]),
-            })
-        except Exception:
-            continue
-    return tasks
+        def call(*args, **kwargs):
+            return timed(current_repository(), *args, **kwargs)
+        call.__name__ = name
+        return call
 
-def add_task(id: int, name: str, description: str, status: bool) -> str:
-    conn = sqlite3.connect(DB_NAME)
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO tasks (id, name, description, status) VALUES (?, ?, ?, ?)",
-            (int(id), name, description, 1 if status else 0),
-        )
-        conn.commit()
-        return f"Task {id} added."
-    except sqlite3.IntegrityError as ie:
-        raise ValueError(f"Task id {id} already exists") from ie
-    finally:
-        conn.close()
+    def run(*args, **kwargs):
+        return getattr(current_repository(), name)(*args, **kwargs)
+    run.__name__ = name
+    return timed_db(run)
 
-def update_task(id: int, name: str, description: str, status: bool) -> str:
-    conn = sqlite3.connect(DB_NAME)
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM tasks WHERE id=?", (int(id),))
-        if not cursor.fetchone():
-            raise ValueError(f"Task {id} not found")
-        cursor.execute(
-            "UPDATE tasks SET name=?, description=?, status=? WHERE id=?",
-            (name, description, 1 if status else 0, int(id)),
-        )
-        conn.commit()
-        return f"Task {id} updated."
-    finally:
-        conn.close()
+get_data_version = scoped("get_data_version")
+get_epoch = scoped("get_epoch")
+changes_since = scoped("changes_since")
+get_next_task_id = scoped("get_next_task_id")
+get_all_tasks = scoped("get_all_tasks")
+list_tasks = scoped("list_tasks")
+iter_tasks = scoped("iter_tasks")
+list_tasks_json = scoped("list_tasks_json")
+count_tasks = scoped("count_tasks")
+search_tasks = scoped("search_tasks")
+get_task = scoped("get_task")
+add_task = scoped("add_task")
+insert_task = scoped("insert_task")
+insert_tasks = scoped("insert_tasks")
+update_task = scoped("update_task")
+patch_task = scoped("patch_task")
+set_status = scoped("set_status")
+delete_task = scoped("delete_task")
+apply_batch = scoped("apply_batch")
+import_tasks = scoped("import_tasks")
+export_tasks = scoped("export_tasks")
+run_once = scoped("run_once")
+get_outcome = scoped("get_outcome")
 
-def delete_task(id: int) -> str:
-    conn = sqlite3.connect(DB_NAME)
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM tasks WHERE id=?", (int(id),))
-        if not cursor.fetchone():
-            raise ValueError(f"Task {id} not found")
-        cursor.execute("DELETE FROM tasks WHERE id=?", (int(id),))
-        conn.commit()
-        return f"Task {id} deleted."
-    finally:
-        conn.close()
+_init_lock = threading.Lock()
+_initialized = False
+
+def init_db() -> None:
+    """Create or upgrade the schema once per process; later calls are no-ops"""
+    global _initialized
+    with _init_lock:
+        if not _initialized:
+            tenants.init_db()
+            _initialized = True
+
+init_db()
@@ -0,0 +1,122 @@
+# prompt.py - prompt budget for agent runs
+#
+# Every model call resends the instructions, the tool schemas, the replayed
+# history and the user message. This module estimates the tokens each of those
+# components costs, trims the replayed history to AGENT_HISTORY_TOKENS (whole
+# earlier runs, oldest first) and keeps per-run totals for /metrics,
+# /agent/stats and the benchmark, including how many tokens the compact prompt
+# style and the trimming saved.
+#
+# Token counts are estimates (about four characters per token): the exact
+# count needs the provider's tokenizer and a network round trip, and the
+# estimate is stable enough to compare prompt variants.
+
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+PROMPT_STYLES = ("compact", "full")
+AGENT_PROMPT_STYLE = os.getenv("AGENT_PROMPT_STYLE", "full").lower()
+AGENT_HISTORY_TOKENS = int(os.getenv("AGENT_HISTORY_TOKENS", "1000"))  # 0 disables trimming
+CHARS_PER_TOKEN = 4
+
+COMPONENTS = ("instructions", "tools", "history", "message")
+
+if AGENT_PROMPT_STYLE not in PROMPT_STYLES:
+    raise ValueError(f"AGENT_PROMPT_STYLE must be one of {', '.join(PROMPT_STYLES)}, not '{AGENT_PROMPT_STYLE}'")
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def message_tokens(message) -> int:
+    """Estimated tokens of an agno Message: its content plus any tool calls"""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+    tokens = estimate_tokens(content)
+    if message.tool_calls:
+        tokens += estimate_tokens(json.dumps(message.tool_calls, default=str))
+    return tokens
+
+
+def _history_runs(history: List[Any]) -> List[List[Any]]:
+    """Split replayed history into runs, each starting at its user message"""
+    runs: List[List[Any]] = []
+    for message in history:
+        if message.role == "user" or not runs:
+            runs.append([])
+        runs[-1].append(message)
+    return runs
+
+
+def trim_history(messages: List[Any], budget: int = AGENT_HISTORY_TOKENS) -> int:
+    """Drop the oldest replayed runs from `messages` (in place) until the history fits `budget`.
+
+    Whole runs are dropped so no tool result loses the call it answers.
+    Returns the estimated tokens removed.
+    """
+    history = [m for m in messages if getattr(m, "from_history", False)]
+    if budget <= 0 or not history:
+        return 0
+    runs = _history_runs(history)
+    sizes = [sum(message_tokens(m) for m in run) for run in runs]
+    total = sum(sizes)
+    dropped: List[Any] = []
+    removed = 0
+    for run, size in zip(runs, sizes):
+        if total - removed <= budget:
+            break
+        dropped.extend(run)
+        removed += size
+    if dropped:
+        gone = set(map(id, dropped))
+        messages[:] = [m for m in messages if id(m) not in gone]
+    return removed
+
+
+def measure_prompt(messages: Iterable[Any], tools: Optional[List[Dict[str, Any]]]) -> Dict[str, int]:
+    """Estimated tokens of each prompt component of one model call"""
+    sizes = dict.fromkeys(COMPONENTS, 0)
+    sizes["tools"] = estimate_tokens(json.dumps(tools)) if tools else 0
+    for message in messages:
+        if message.role == "system":
+            component = "instructions"
+        elif getattr(message, "from_history", False):
+            component = "history"
+        else:
+            component = "message"
+        sizes[component] += message_tokens(message)
+    return sizes
+
+
+class PromptStats:
+    """Thread-safe per-component totals of prompt tokens sent and saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.sent = dict.fromkeys(COMPONENTS, 0)
+        self.saved = dict.fromkeys(COMPONENTS, 0)
+
+    def record(self, sent: Dict[str, int], saved: Dict[str, int]) -> None:
+        with self._lock:
+            self.runs += 1
+            for component in COMPONENTS:
+                self.sent[component] += sent.get(component, 0)
+                self.saved[component] += saved.get(component, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            runs = self.runs or 1
+            sent = {c: round(n / runs, 1) for c, n in self.sent.items()}
+            saved = {c: round(n / runs, 1) for c, n in self.saved.items()}
+            return {
+                "runs": self.runs,
+                "tokens_per_run": {**sent, "total": round(sum(self.sent.values()) / runs, 1)},
+                "saved_per_run": {**saved, "total": round(sum(self.saved.values()) / runs, 1)},
+            }
+
+
+prompt_stats = PromptStats()
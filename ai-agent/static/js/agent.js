@@ -1,5 +1,19 @@
 const API_URL = 'http://localhost:8000';
 
+// Each browser tab keeps its own agent session (and history) until the chat is cleared
+function newSessionId() {
+    return (crypto.randomUUID && crypto.randomUUID()) || `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+}
+
+function getSessionId() {
+    let sessionId = sessionStorage.getItem('agentSessionId');
+    if (!sessionId) {
+        sessionId = newSessionId();
+        sessionStorage.setItem('agentSessionId', sessionId);
+    }
+    return sessionId;
+}
+
 // Helper function to escape HTML
 function escapeHtml(unsafe) {
     return unsafe
@@ -67,30 +81,8 @@ function addChatMessage(sender, text, isMarkdown = false) {
         messageContainer.classList.add('assistant-message-container');
 
         if (isMarkdown && text) {
-            // Render markdown content with proper styling
-            const md = marked.parse(text, { 
-                breaks: true,
-                gfm: true,
-                headerIds: false
-            });
-            
-            // Clean up the markdown output and add custom styling
-            const cleaned = md
-                .replace(/<p>/g, '<p class="md-paragraph">')
-                .replace(/<h1>/g, '<h1 class="md-heading">')
-                .replace(/<h2>/g, '<h2 class="md-heading">')
-                .replace(/<h3>/g, '<h3 class="md-heading">')
-                .replace(/<strong>/g, '<strong class="md-bold">')
-                .replace(/<em>/g, '<em class="md-italic">')
-                .replace(/<ul>/g, '<ul class="md-list">')
-                .replace(/<ol>/g, '<ol class="md-list">')
-                .replace(/<li>/g, '<li class="md-list-item">')
-                .replace(/<code>/g, '<code class="md-code">')
-                .replace(/<pre>/g, '<pre class="md-pre">')
-                .replace(/<blockquote>/g, '<blockquote class="md-blockquote">');
-            
             messageContainer.innerHTML = `
-                <div class="message-content markdown-content">${cleaned}</div>
+                <div class="message-content markdown-content">${renderMarkdown(text)}</div>
                 ${timeHtml}
             `;
         } else {
@@ -104,10 +96,60 @@ function addChatMessage(sender, text, isMarkdown = false) {
 
     messagesContainer.appendChild(messageContainer);
     scrollToBottom();
+    return messageContainer;
+}
+
+function renderMarkdown(text) {
+    // Render markdown content with proper styling
+    const md = marked.parse(text, { 
+        breaks: true,
+        gfm: true,
+        headerIds: false
+    });
+
+    // Clean up the markdown output and add custom styling
+    return md
+        .replace(/<p>/g, '<p class="md-paragraph">')
+        .replace(/<h1>/g, '<h1 class="md-heading">')
+        .replace(/<h2>/g, '<h2 class="md-heading">')
+        .replace(/<h3>/g, '<h3 class="md-heading">')
+        .replace(/<strong>/g, '<strong class="md-bold">')
+        .replace(/<em>/g, '<em class="md-italic">')
+        .replace(/<ul>/g, '<ul class="md-list">')
+        .replace(/<ol>/g, '<ol class="md-list">')
+        .replace(/<li>/g, '<li class="md-list-item">')
+        .replace(/<code>/g, '<code class="md-code">')
+        .replace(/<pre>/g, '<pre class="md-pre">')
+        .replace(/<blockquote>/g, '<blockquote class="md-blockquote">');
+}
+
+// Parse a Server-Sent Events body from fetch() and call onEvent(type, data) per event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let type = 'message';
+            let data = '';
+            for (const line of raw.split('\n')) {
+                if (line.startsWith('event:')) type = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            if (data) onEvent(type, JSON.parse(data));
+        }
+    }
 }
 
 function clearChat() {
     if (!confirm('Are you sure you want to clear the chat history?')) return;
+    sessionStorage.setItem('agentSessionId', newSessionId());
     const messagesContainer = document.getElementById('conversation-area');
     messagesContainer.innerHTML = `
         <div id="initial-message" class="flex flex-col items-center justify-center h-full">
@@ -146,25 +188,38 @@ async function sendChatMessage() {
 
     showLoadingIndicator();
 
+    let reply = '';
+    let replyEl = null;
     try {
-        const response = await fetch(`${API_URL}/agent/chat`, {
+        const response = await fetch(`${API_URL}/agent/chat/stream`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ message })
+            body: JSON.stringify({ message, session_id: getSessionId() })
         });
 
-        if (!response.ok) {
-            const err = await response.json().catch(() => ({}));
-            throw new Error(err.reply || `HTTP error ${response.status}`);
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP error ${response.status}`);
         }
 
-        const data = await response.json();
-        const reply = data.reply || '';
+        await readEventStream(response, (type, data) => {
+            if (type === 'token') {
+                reply += data.content;
+                if (!replyEl) {
+                    hideLoadingIndicator();
+                    replyEl = addChatMessage('Assistant', reply, true);
+                } else {
+                    replyEl.querySelector('.message-content').innerHTML = renderMarkdown(reply);
+                    scrollToBottom();
+                }
+            } else if (type === 'tool_call') {
+                console.debug('Tool call:', data.name, data.args);
+            } else if (type === 'error') {
+                throw new Error(data.message);
+            }
+        });
 
-        if (!reply || reply.trim() === '') {
+        if (!reply.trim()) {
             addChatMessage('Assistant', "I'm here to help with your tasks! You can ask me to show your tasks, create a new task, or update/delete tasks. What would you like to do?");
-        } else {
-            addChatMessage('Assistant', reply, true);
         }
     } catch (error) {
         console.error('Error:', error);
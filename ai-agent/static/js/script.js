@@ -3,6 +3,9 @@ const API_URL = 'http://localhost:8000';
 
 // State variables
 let tasks = [];
+let tasksVersion = null;  // X-Data-Version of the task list we hold
+let tasksEpoch = null;    // X-Data-Epoch that version belongs to
+let taskFeed = null;
 let currentFilter = 'all';
 let currentDate = new Date();
 let currentMonth = currentDate.getMonth();
@@ -342,6 +345,9 @@ async function loadTasks() {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         const data = await response.json();
+        const version = response.headers.get('X-Data-Version');
+        tasksVersion = version === null ? null : Number(version);
+        tasksEpoch = response.headers.get('X-Data-Epoch');
         if (Array.isArray(data)) {
             tasks = data;
         } else if (data && Array.isArray(data.tasks)) {
@@ -351,6 +357,7 @@ async function loadTasks() {
         }
         filterTasks(currentFilter);
         updateStats();
+        subscribeToChanges();
     } catch (error) {
         console.error('Error loading tasks:', error);
         alert('Could not load tasks. Please try again later.');
@@ -359,6 +366,61 @@ async function loadTasks() {
     }
 }
 
+// Apply a /changes delta to the local task list
+function applyChanges(delta) {
+    if (delta.reset || tasksVersion === null) {
+        return loadTasks();
+    }
+    if (delta.version <= tasksVersion && delta.changes.length === 0) {
+        return;
+    }
+    delta.changes.forEach(change => {
+        const id = change.op === 'delete' ? change.id : change.task.id;
+        const index = tasks.findIndex(t => t.id === id);
+        if (change.op === 'delete') {
+            if (index !== -1) tasks.splice(index, 1);
+        } else if (index !== -1) {
+            tasks[index] = change.task;
+        } else {
+            tasks.push(change.task);
+            tasks.sort((a, b) => a.id - b.id);
+        }
+    });
+    tasksVersion = Math.max(tasksVersion, delta.version);
+    tasksEpoch = String(delta.epoch);
+    filterTasks(currentFilter);
+    updateStats();
+}
+
+// Query string naming the version (and its epoch) the task list is at
+function changesQuery() {
+    return `since=${tasksVersion}` + (tasksEpoch === null ? '' : `&epoch=${tasksEpoch}`);
+}
+
+// Fetch only what changed since the list was loaded
+async function syncTasks() {
+    if (tasksVersion === null) {
+        return loadTasks();
+    }
+    try {
+        const response = await fetch(`${API_URL}/changes?${changesQuery()}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        await applyChanges(await response.json());
+    } catch (error) {
+        console.error('Error syncing tasks:', error);
+        loadTasks();
+    }
+}
+
+// Live updates (including changes made by the agent) over Server-Sent Events
+function subscribeToChanges() {
+    if (taskFeed || !window.EventSource || tasksVersion === null) return;
+    taskFeed = new EventSource(`${API_URL}/changes/stream?${changesQuery()}`);
+    taskFeed.addEventListener('changes', event => applyChanges(JSON.parse(event.data)));
+}
+
 // Display tasks based on the current filter
 function filterTasks(filter) {
     currentFilter = filter;
@@ -444,9 +506,8 @@ async function addTask() {
         return;
     }
     try {
-        const tempId = tasks.length > 0 ? Math.max(...tasks.map(t => t.id)) + 1 : 1;
+        // no id: the server allocates one, so concurrent clients never collide
         const newTask = {
-            id: tempId,
             name: name,
             description: description,
             status: false
@@ -464,7 +525,7 @@ async function addTask() {
         taskNameInput.value = '';
         taskDescriptionInput.value = '';
         toggleAddTaskForm();
-        await loadTasks();
+        await syncTasks();
         const newTaskElement = document.querySelector('.task-card:last-child');
         if (newTaskElement) {
             newTaskElement.scrollIntoView({ behavior: 'smooth' });
@@ -491,7 +552,7 @@ async function updateTask(taskId, field, value) {
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        await loadTasks();
+        await syncTasks();
     } catch (error) {
         console.error('Error updating task:', error);
         alert('Could not update task: ' + error.message);
@@ -515,7 +576,7 @@ async function toggleTaskStatus(taskId) {
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        await loadTasks();
+        await syncTasks();
     } catch (error) {
         console.error('Error toggling task status:', error);
         alert('Could not toggle task status: ' + error.message);
@@ -533,7 +594,7 @@ async function deleteTask(taskId) {
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        await loadTasks();
+        await syncTasks();
     } catch (error) {
         console.error('Error deleting task:', error);
         alert('Could not delete task: ' + error.message);
@@ -0,0 +1,123 @@
+"""Admission control: rate limit, fair queue and single flight"""
+
+import asyncio
+
+import pytest
+
+from admission import ChatAdmission, FairQueue, Rejected, SingleFlight, TokenBuckets
+
+
+def test_bucket_allows_a_burst_then_429():
+    buckets = TokenBuckets(rate=1, burst=3)
+    for _ in range(3):
+        buckets.take("a")
+    with pytest.raises(Rejected) as rejected:
+        buckets.take("a")
+    assert rejected.value.status == 429
+    assert rejected.value.retry_after == 1
+    # other clients have their own bucket
+    buckets.take("b")
+
+
+def test_bucket_refills_over_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("admission.time.monotonic", lambda: now[0])
+    buckets = TokenBuckets(rate=2, burst=1)
+    buckets.take("a")
+    with pytest.raises(Rejected):
+        buckets.take("a")
+    now[0] += 0.5
+    buckets.take("a")
+
+
+def test_fair_queue_serves_clients_round_robin():
+    async def scenario():
+        queue = FairQueue(limit=1, max_waiting=10, timeout=5)
+        await queue.acquire("a")
+        order = []
+
+        async def wait(client, name):
+            await queue.acquire(client)
+            order.append(name)
+            queue.release()
+
+        # a busy client queues three runs before another client queues one
+        waiters = [asyncio.create_task(wait("a", f"a{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        waiters.append(asyncio.create_task(wait("b", "b0")))
+        await asyncio.sleep(0)
+        queue.release()
+        await asyncio.gather(*waiters)
+        return order, queue.running, queue.waiting
+
+    order, running, waiting = asyncio.run(scenario())
+    assert order == ["a0", "b0", "a1", "a2"]
+    assert (running, waiting) == (0, 0)
+
+
+def test_full_queue_is_503():
+    async def scenario():
+        queue = FairQueue(limit=1, max_waiting=1, timeout=5)
+        await queue.acquire("a")
+        waiter = asyncio.create_task(queue.acquire("b"))
+        await asyncio.sleep(0)
+        try:
+            await queue.acquire("c")
+        finally:
+            queue.release()
+            await waiter
+
+    with pytest.raises(Rejected) as rejected:
+        asyncio.run(scenario())
+    assert rejected.value.status == 503
+
+
+def test_single_flight_shares_an_unchanged_run():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "reply", True
+
+        results = await asyncio.gather(*(flights.run("key", call) for _ in range(3)))
+        return results, len(calls)
+
+    results, calls = asyncio.run(scenario())
+    assert calls == 1
+    assert sorted(results) == [("reply", False), ("reply", True), ("reply", True)]
+
+
+def test_single_flight_reruns_after_a_write():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return f"reply {len(calls)}", False
+
+        return await asyncio.gather(flights.run("key", call), flights.run("key", call))
+
+    assert asyncio.run(scenario()) == [("reply 1", False), ("reply 2", False)]
+
+
+def test_coalesced_callers_spend_no_token():
+    async def scenario():
+        admission = ChatAdmission()
+        admission.buckets = TokenBuckets(rate=1, burst=1)
+
+        async def call():
+            await asyncio.sleep(0.01)
+            return "reply", True
+
+        replies = await asyncio.gather(*(admission.coalesce("key", "client", call) for _ in range(3)))
+        return replies, admission.counts
+
+    replies, counts = asyncio.run(scenario())
+    assert replies == ["reply"] * 3
+    assert counts["coalesced"] == 2
+    assert counts["rate_limited"] == 0
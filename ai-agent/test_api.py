@@ -0,0 +1,106 @@
+"""REST endpoints of main.py, each test as its own owner so they share no tasks"""
+
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app, headers={"X-Owner": f"test-{uuid.uuid4().hex[:12]}"}) as client:
+        yield client
+
+
+def test_batch_applies_items_and_skips_failures(client):
+    response = client.post(
+        "/batch", json={"operations": [{"op": "create", "name": "a"}, {"op": "delete", "id": 99}]}
+    )
+    assert response.status_code == 200
+    assert [r["ok"] for r in response.json()["results"]] == [True, False]
+    assert [t["name"] for t in client.get("/").json()["tasks"]] == ["a"]
+
+
+def test_failed_atomic_batch_is_409_and_applies_nothing(client):
+    response = client.post(
+        "/batch",
+        json={"operations": [{"op": "create", "name": "a"}, {"op": "delete", "id": 99}], "atomic": True},
+    )
+    assert response.status_code == 409
+    assert response.json() == {
+        "detail": {
+            "committed": False,
+            "results": [
+                {"index": 0, "ok": False, "error": "rolled back"},
+                {"index": 1, "ok": False, "error": "Task 99 not found"},
+            ],
+        }
+    }
+    assert client.get("/").json()["tasks"] == []
+
+
+def test_etag_gives_304_until_a_write(client):
+    response = client.get("/")
+    etag = response.headers["ETag"]
+    assert "X-Owner" in response.headers["Vary"]
+    assert etag == f'"{client.headers["X-Owner"]}.{response.headers["X-Data-Epoch"]}.{response.headers["X-Data-Version"]}"'
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    client.post("/add", json={"name": "a", "description": "", "status": False})
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_etags_differ_between_owners(client):
+    etag = client.get("/").headers["ETag"]
+    other = client.get("/", headers={"X-Owner": f"test-{uuid.uuid4().hex[:12]}", "If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
+
+
+def test_changes_since_a_version(client):
+    for name in ("a", "b"):
+        client.post("/add", json={"name": name, "description": "", "status": False})
+    listed = client.get("/")
+    since, epoch = listed.headers["X-Data-Version"], listed.headers["X-Data-Epoch"]
+    client.delete("/delete/1")
+    client.put("/update/2", json={"name": "b", "description": "", "status": True})
+
+    delta = client.get("/changes", params={"since": since, "epoch": epoch}).json()
+    assert delta["reset"] is False
+    assert delta["epoch"] == int(epoch)
+    assert [(c["op"], c.get("id") or c["task"]["id"]) for c in delta["changes"]] == [("delete", 1), ("upsert", 2)]
+    assert delta["changes"][1]["task"]["status"] is True
+    assert client.get("/changes", params={"since": delta["version"], "epoch": epoch}).json()["changes"] == []
+
+
+def test_changes_from_another_epoch_reset(client):
+    client.post("/add", json={"name": "a", "description": "", "status": False})
+    epoch = int(client.get("/").headers["X-Data-Epoch"])
+    delta = client.get("/changes", params={"since": 0, "epoch": epoch + 1}).json()
+    assert delta["reset"] is True
+    assert delta["changes"] == []
+
+
+def test_import_then_export_round_trips(client):
+    body = "name,description,status,id\nBuy milk,2 litres,true,5\nCall mom,,false,\n"
+    response = client.post("/import", content=body, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    assert response.json() == {"imported": 2, "version": int(client.get("/").headers["X-Data-Version"])}
+
+    exported = client.get("/export").text.splitlines()
+    assert [json.loads(line) for line in exported] == [
+        {"id": 5, "name": "Buy milk", "description": "2 litres", "status": True},
+        {"id": 6, "name": "Call mom", "description": "", "status": False},
+    ]
+
+
+def test_import_rejects_bad_rows(client):
+    response = client.post("/import?format=jsonl", content='{"description": "no name"}\n')
+    assert response.status_code == 400
+    assert client.get("/").json()["tasks"] == []
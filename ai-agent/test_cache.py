@@ -0,0 +1,63 @@
+"""Reply cache: which replies are cached, and for whom"""
+
+import uuid
+
+import pytest
+
+import agent
+from models import insert_task
+from task_repository import current_owner
+
+
+@pytest.mark.parametrize(
+    "message, tool_calls",
+    [
+        ("show my tasks", [("show_tasks", {})]),
+        ("show my done tasks", [("show_tasks", {"status": "done"})]),
+        ("find tasks about milk", [("find_tasks", {"query": "milk", "limit": 10})]),
+        ("show pending tasks and find milk", [("show_tasks", {"status": "pending"}), ("find_tasks", {"query": "milk"})]),
+    ],
+)
+def test_reads_spelled_out_by_the_message_are_cacheable(message, tool_calls):
+    assert agent.reply_from_message(message, tool_calls)
+
+
+@pytest.mark.parametrize(
+    "message, tool_calls",
+    [
+        # no tool call: the reply came from the model and the history
+        ("what did I just ask?", []),
+        # a write never repeats from the cache
+        ("add milk", [("create_task", {"name": "milk"})]),
+        # page 2 came from the history, not from "next page"
+        ("next page", [("show_tasks", {"page": 2})]),
+        ("find it", [("find_tasks", {"query": "milk"})]),
+    ],
+)
+def test_replies_depending_on_the_session_are_not(message, tool_calls):
+    assert not agent.reply_from_message(message, tool_calls)
+
+
+@pytest.fixture
+def owner():
+    token = current_owner.set(f"test-{uuid.uuid4().hex[:12]}")
+    yield
+    current_owner.reset(token)
+
+
+def test_cached_reply_is_per_session_and_version(owner):
+    reply, version = agent.cached_reply("show my tasks", "a")
+    assert reply is None
+    assert agent.remember_reply("show my tasks", "a", version, "No tasks", [("show_tasks", {})])
+
+    assert agent.cached_reply("Show my tasks!", "a") == ("No tasks", version)
+    assert agent.cached_reply("show my tasks", "b")[0] is None
+    insert_task("milk")
+    assert agent.cached_reply("show my tasks", "a")[0] is None
+
+
+def test_reply_of_a_run_that_wrote_is_not_cached(owner):
+    _, version = agent.cached_reply("show my tasks", "a")
+    insert_task("milk")
+    assert not agent.remember_reply("show my tasks", "a", version, "No tasks", [("show_tasks", {})])
+    assert agent.cached_reply("show my tasks", "a")[0] is None
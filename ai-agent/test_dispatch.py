@@ -0,0 +1,82 @@
+"""Tool-call ordering: per task id and per agent run"""
+
+import asyncio
+import threading
+import time
+
+from dispatch import CREATE, READ, WRITE, CallOrder, ToolDispatcher, call_order
+
+
+def recorder(log):
+    def tool(name, seconds=0.0):
+        time.sleep(seconds)
+        log.append(name)
+        return name
+    return tool
+
+
+def test_writes_to_one_task_keep_their_order():
+    async def scenario():
+        dispatcher = ToolDispatcher(max_workers=4)
+        log = []
+        tool = recorder(log)
+        call_order.set(CallOrder())
+        await asyncio.gather(
+            dispatcher.run(tool, {"name": "first", "seconds": 0.05}, access=WRITE, key=1),
+            dispatcher.run(tool, {"name": "other task"}, access=WRITE, key=2),
+            dispatcher.run(tool, {"name": "second"}, access=WRITE, key=1),
+        )
+        dispatcher.shutdown()
+        return log
+
+    log = asyncio.run(scenario())
+    assert log.index("first") < log.index("second")
+    # a write to another task does not wait for task 1
+    assert log[0] == "other task"
+
+
+def test_read_waits_for_earlier_writes_only():
+    async def scenario():
+        dispatcher = ToolDispatcher(max_workers=4)
+        log = []
+        tool = recorder(log)
+        call_order.set(CallOrder())
+        await asyncio.gather(
+            dispatcher.run(tool, {"name": "create", "seconds": 0.05}, access=CREATE),
+            dispatcher.run(tool, {"name": "read"}, access=READ),
+            dispatcher.run(tool, {"name": "later create"}, access=CREATE),
+        )
+        dispatcher.shutdown()
+        return log
+
+    log = asyncio.run(scenario())
+    assert log.index("create") < log.index("read")
+    assert log[0] == "later create"
+
+
+def test_runs_do_not_wait_for_each_other():
+    async def scenario():
+        dispatcher = ToolDispatcher(max_workers=4)
+        log = []
+        tool = recorder(log)
+        release = threading.Event()
+
+        async def run(calls):
+            # each agent run sets its own CallOrder in its own task context
+            call_order.set(CallOrder())
+            return await asyncio.gather(*calls())
+
+        slow = run(lambda: [dispatcher.run(lambda: release.wait(1) and tool("slow write"), {}, access=WRITE, key=1)])
+        fast = run(lambda: [
+            dispatcher.run(tool, {"name": "same id"}, access=WRITE, key=1),
+            dispatcher.run(tool, {"name": "read"}, access=READ),
+        ])
+        slow_task = asyncio.create_task(slow)
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(fast, 1)
+        release.set()
+        await slow_task
+        dispatcher.shutdown()
+        return log
+
+    assert asyncio.run(scenario()) == ["same id", "read", "slow write"]
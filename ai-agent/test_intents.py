@@ -0,0 +1,50 @@
+"""Fast-path router: which messages skip the LLM, and as which tool call"""
+
+import pytest
+
+from intents import RouterStats, match_intent
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("show my tasks", ("show_tasks", "show_tasks", {})),
+        ("Please list all of my todos!", ("show_tasks", "show_tasks", {})),
+        ("what's on my   list?", ("show_tasks", "show_tasks", {})),
+        ("show me pending tasks", ("show_pending", "show_tasks", {"status": "pending"})),
+        ("list completed tasks", ("show_done", "show_tasks", {"status": "done"})),
+        ("mark task 3 as done", ("mark_complete", "mark_task_complete", {"task_id": 3})),
+        ("complete task #12.", ("mark_complete", "mark_task_complete", {"task_id": 12})),
+        ("set task 4 as not done", ("mark_pending", "mark_task_pending", {"task_id": 4})),
+        ("can you delete task 7 please", ("remove_task", "remove_task", {"task_id": 7})),
+    ],
+)
+def test_simple_commands_match(message, expected):
+    assert match_intent(message) == expected
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "add a task called milk",
+        "show my tasks about milk",
+        "mark task 3 and 4 as done",
+        "delete the milk task",
+        "don't delete task 7",
+        "",
+    ],
+)
+def test_anything_else_goes_to_the_llm(message):
+    assert match_intent(message) is None
+
+
+def test_router_stats():
+    stats = RouterStats()
+    for intent in ("show_tasks", None, "show_tasks", "remove_task"):
+        stats.record(intent)
+    assert stats.snapshot() == {
+        "hits": 3,
+        "misses": 1,
+        "hit_rate": 0.75,
+        "by_intent": {"show_tasks": 2, "remove_task": 1},
+    }
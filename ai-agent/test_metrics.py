@@ -0,0 +1,51 @@
+"""Prometheus text rendering of the metrics in metrics.py"""
+
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_renders_sorted_series():
+    counter = Counter("jobs_total", "Jobs run", ["kind"])
+    counter.inc("b")
+    counter.inc("a", amount=2)
+    counter.inc("b")
+    assert counter.render() == [
+        "# HELP jobs_total Jobs run",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="a"} 2',
+        'jobs_total{kind="b"} 2',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("jobs_total", "Jobs run", ["name"])
+    counter.inc('say "hi"\\now\nplease')
+    assert counter.render()[-1] == 'jobs_total{name="say \\"hi\\"\\\\now\\nplease"} 1'
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("wait_seconds", "Waits", ["queue"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "q")
+    assert histogram.render()[2:] == [
+        'wait_seconds_bucket{queue="q",le="0.1"} 1',
+        'wait_seconds_bucket{queue="q",le="1"} 3',
+        'wait_seconds_bucket{queue="q",le="+Inf"} 4',
+        'wait_seconds_sum{queue="q"} 6.050000',
+        'wait_seconds_count{queue="q"} 4',
+    ]
+
+
+def test_registry_renders_gauges_from_callbacks():
+    registry = Registry()
+    sizes = {"a": 3}
+    registry.register(Gauge("queue_size", "Queued items", ["queue"], lambda: {(k,): v for k, v in sizes.items()}))
+    registry.register(Counter("idle_total", "No samples yet"))
+    sizes["b"] = 0
+    assert registry.render() == (
+        "# HELP queue_size Queued items\n"
+        "# TYPE queue_size gauge\n"
+        'queue_size{queue="a"} 3\n'
+        'queue_size{queue="b"} 0\n'
+        "# HELP idle_total No samples yet\n"
+        "# TYPE idle_total counter\n"
+    )
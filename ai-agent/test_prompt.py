@@ -0,0 +1,68 @@
+"""Prompt budget: token estimates and history trimming"""
+
+from agno.models.message import Message
+
+from prompt import estimate_tokens, measure_prompt, trim_history
+
+
+def past_run(question, answer, chars=400):
+    """One replayed run: a user message, a tool call and its result, and the reply"""
+    return [
+        Message(role="user", content=question, from_history=True),
+        Message(
+            role="assistant",
+            tool_calls=[{"id": question, "type": "function", "function": {"name": "show_tasks", "arguments": "{}"}}],
+            from_history=True,
+        ),
+        Message(role="tool", tool_call_id=question, content="x" * chars, from_history=True),
+        Message(role="assistant", content=answer, from_history=True),
+    ]
+
+
+def prompt(*runs):
+    return [
+        Message(role="system", content="You manage todo lists."),
+        *[m for run in runs for m in run],
+        Message(role="user", content="show my tasks"),
+    ]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_history_within_budget_is_kept():
+    messages = prompt(past_run("one", "1"), past_run("two", "2"))
+    assert trim_history(messages, budget=1000) == 0
+    assert len(messages) == 10
+
+
+def test_oldest_whole_runs_are_dropped_first():
+    first, second, third = past_run("one", "1"), past_run("two", "2"), past_run("three", "3")
+    messages = prompt(first, second, third)
+    removed = trim_history(messages, budget=250)
+    assert removed == measure_prompt(first, None)["history"] * 2
+    # the system prompt, the newest run and the new message stay, in order
+    assert [m.content for m in messages if m.role in ("system", "user")] == [
+        "You manage todo lists.", "three", "show my tasks",
+    ]
+    assert messages[1:-1] == third
+
+
+def test_zero_budget_disables_trimming():
+    messages = prompt(past_run("one", "1", chars=10_000))
+    assert trim_history(messages, budget=0) == 0
+    assert len(messages) == 6
+
+
+def test_measure_prompt_by_component():
+    messages = prompt(past_run("one", "1"))
+    tools = [{"name": "show_tasks", "parameters": {}}]
+    sizes = measure_prompt(messages, tools)
+    assert sizes["instructions"] == estimate_tokens("You manage todo lists.")
+    assert sizes["message"] == estimate_tokens("show my tasks")
+    assert sizes["history"] > 100
+    assert sizes["tools"] > 0
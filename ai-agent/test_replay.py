@@ -0,0 +1,53 @@
+"""Keyed tool calls: run at most once per call, and never stuck on a failure"""
+
+import sqlite3
+import uuid
+
+import pytest
+
+import agent
+from models import add_task, get_all_tasks, insert_task
+from task_repository import current_owner
+
+
+@pytest.fixture
+def keyed_run():
+    """A keyed chat request of a fresh owner"""
+    owner = current_owner.set(f"test-{uuid.uuid4().hex[:12]}")
+    run = agent.current_run.set(agent.RunKeys(uuid.uuid4().hex, "add a task called milk"))
+    yield
+    agent.current_run.reset(run)
+    current_owner.reset(owner)
+
+
+def call(tool, **kwargs):
+    """One model call of `tool`, numbered within the request like a retry would number it"""
+    agent.current_run.get()._calls.clear()
+    return agent.replay_safe(tool, kwargs)(**kwargs)
+
+
+def test_retried_call_is_replayed(keyed_run):
+    assert call(agent.create_task, name="milk") == "Created task #1: milk"
+    assert call(agent.create_task, name="milk") == "Created task #1: milk"
+    assert [t["name"] for t in get_all_tasks()] == ["milk"]
+
+
+def test_failed_call_runs_again_on_retry(keyed_run, monkeypatch):
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(agent, "insert_task", locked)
+    assert call(agent.create_task, name="milk") == "Failed to create task: database is locked"
+    assert get_all_tasks() == []
+
+    monkeypatch.setattr(agent, "insert_task", insert_task)
+    assert call(agent.create_task, name="milk") == "Created task #1: milk"
+    assert [t["name"] for t in get_all_tasks()] == ["milk"]
+
+
+def test_not_found_is_recorded(keyed_run):
+    assert call(agent.remove_task, task_id=7) == "Error: Task 7 not found"
+    add_task(7, "milk", "", False)
+    # the retry gets the recorded outcome instead of deleting the task made since
+    assert call(agent.remove_task, task_id=7) == "Error: Task 7 not found"
+    assert [t["id"] for t in get_all_tasks()] == [7]
@@ -0,0 +1,153 @@
+"""Shared task storage for the todo_app and ai-agent FastAPI apps.
+
+Every engine implements the TaskRepository interface:
+
+- "sqlite" (default): one SQLite file with a single schema (with migrations),
+  one pooled connection strategy and one set of queries
+- "memory": dict + sorted id index + status sets, no disk I/O (tests, hot sets)
+- "write-behind": memory reads and writes, flushed to SQLite in batches
+
+Only "sqlite" can be shared by several worker processes (WEB_CONCURRENCY > 1).
+
+A repository holds one owner's tasks. create_tenants() builds the per-owner
+repositories, in one shared file or one file per owner (see tenants.py):
+
+    tenants = create_tenants("/path/to/todos.db")  # mode from TODO_TENANCY
+    tenants.init_db()
+    with owner_scope("team-a"):
+        tenants.get().insert_task("Buy milk")  # team-a's task #1
+
+    from task_repository import create_repository
+
+    repository = create_repository("/path/to/todos.db")  # engine from TODO_STORAGE_ENGINE
+    repository.init_db()
+    repository.insert_task("Buy milk")
+
+Bulk CSV/JSONL import and export: see transfer.py, or run
+`python -m task_repository --help`.
+"""
+
+import os
+from typing import Optional
+
+from .base import (
+    BATCH_OPS,
+    BULK_CHUNK_SIZE,
+    DEFAULT_OWNER,
+    DEFAULT_PAGE_SIZE,
+    MAX_BATCH_SIZE,
+    MAX_PAGE_SIZE,
+    STREAM_CHUNK_SIZE,
+    TASK_COLUMNS,
+    BatchAborted,
+    Task,
+    TaskRepository,
+)
+from .encoding import dumps, encode_tasks
+from .memory import MemoryRepository
+from .pool import BUSY_TIMEOUT_MS, ConnectionPool, connect
+from .schema import SCHEMA_VERSION, migrate
+from .sqlite import SQLiteRepository
+from .tenants import (
+    OWNER_HEADER,
+    TENANCY,
+    TENANCY_MODES,
+    OwnerMiddleware,
+    TenantRepositories,
+    check_owner,
+    current_owner,
+    owner_scope,
+    shard_path,
+)
+from .transfer import FORMATS, MEDIA_TYPES, import_rows, read_rows, write_rows
+from .write_behind import WriteBehindRepository
+
+ENGINES = ("sqlite", "memory", "write-behind")
+# worker processes serving the app; uvicorn and gunicorn both read WEB_CONCURRENCY
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def _engine(engine: Optional[str]) -> str:
+    engine = (engine or os.getenv("TODO_STORAGE_ENGINE", "sqlite")).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown storage engine '{engine}'; expected one of {', '.join(ENGINES)}")
+    if engine != "sqlite" and WORKERS > 1:
+        # each process would hold its own copy of the tasks
+        raise ValueError(f"The '{engine}' engine is per-process; use 'sqlite' with WEB_CONCURRENCY={WORKERS}")
+    return engine
+
+
+def create_repository(path: str, engine: Optional[str] = None, owner: str = DEFAULT_OWNER) -> TaskRepository:
+    """Build the storage engine named by `engine` (default: $TODO_STORAGE_ENGINE or "sqlite") for `owner`"""
+    engine = _engine(engine)
+    if engine == "sqlite":
+        return SQLiteRepository(path, owner=owner)
+    if engine == "memory":
+        return MemoryRepository()
+    return WriteBehindRepository(path, owner=owner)
+
+
+def create_tenants(path: str, engine: Optional[str] = None, mode: Optional[str] = None) -> TenantRepositories:
+    """Per-owner repositories over `path`, in one file or (mode="sharded") one file per owner"""
+    engine = _engine(engine)
+    mode = (mode or TENANCY).lower()
+    if mode not in TENANCY_MODES:
+        raise ValueError(f"Unknown tenancy mode '{mode}'; expected one of {', '.join(TENANCY_MODES)}")
+    if mode == "sharded":
+        def factory(owner: str) -> TaskRepository:
+            shard = shard_path(path, owner)
+            os.makedirs(os.path.dirname(os.path.abspath(shard)), exist_ok=True)
+            return create_repository(shard, engine, owner)
+    elif engine == "sqlite":
+        # one pool for the file; other owners get views over it
+        root = SQLiteRepository(path)
+
+        def factory(owner: str) -> TaskRepository:
+            return root if owner == DEFAULT_OWNER else root.for_owner(owner)
+    else:
+        def factory(owner: str) -> TaskRepository:
+            return create_repository(path, engine, owner)
+    return TenantRepositories(factory)
+
+
+__all__ = [
+    "BATCH_OPS",
+    "BULK_CHUNK_SIZE",
+    "BUSY_TIMEOUT_MS",
+    "DEFAULT_OWNER",
+    "DEFAULT_PAGE_SIZE",
+    "ENGINES",
+    "FORMATS",
+    "MAX_BATCH_SIZE",
+    "MAX_PAGE_SIZE",
+    "MEDIA_TYPES",
+    "OWNER_HEADER",
+    "SCHEMA_VERSION",
+    "STREAM_CHUNK_SIZE",
+    "TASK_COLUMNS",
+    "TENANCY",
+    "TENANCY_MODES",
+    "WORKERS",
+    "BatchAborted",
+    "ConnectionPool",
+    "MemoryRepository",
+    "OwnerMiddleware",
+    "SQLiteRepository",
+    "Task",
+    "TaskRepository",
+    "TenantRepositories",
+    "WriteBehindRepository",
+    "check_owner",
+    "connect",
+    "create_repository",
+    "create_tenants",
+    "current_owner",
+    "dumps",
+    "encode_tasks",
+    "import_rows",
+    "migrate",
+    "owner_scope",
+    "read_rows",
+    "shard_path",
+    "write_rows",
+]
@@ -0,0 +1,76 @@
+"""Bulk task import/export from the command line.
+
+    python -m task_repository export --db ai-agent/todos.db -o tasks.csv
+    python -m task_repository export --db ai-agent/todos.db --format jsonl > tasks.jsonl
+    python -m task_repository import --db todo_app/todos.db tasks.csv
+    python -m task_repository export --db ai-agent/todos.db --owner team-a -o team-a.csv
+
+Always uses the SQLite engine on the given file, so it is safe to run next to
+the apps (WAL lets the export read while they write). --owner picks whose tasks
+to read or write; with TODO_TENANCY=sharded, point --db at that owner's file.
+"""
+
+import argparse
+import sys
+import time
+
+from .base import BULK_CHUNK_SIZE
+from .sqlite import SQLiteRepository
+from .tenants import check_owner
+from .transfer import FORMATS, guess_format, import_rows, read_rows, write_rows
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m task_repository", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("file", nargs="?", default="-", help="file to import ('-' for stdin)")
+    parser.add_argument("--db", required=True, help="SQLite database file")
+    parser.add_argument("--owner", default="", help="owner of the tasks (default: the default owner)")
+    parser.add_argument("-o", "--output", default="-", help="export destination ('-' for stdout)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension, else jsonl")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="rows per transaction / fetch")
+    return parser.parse_intermixed_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        owner = check_owner(args.owner)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    repository = SQLiteRepository(args.db, owner=owner)
+    repository.init_db()
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            format = args.format or guess_format(args.output, default="jsonl")
+            out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+            try:
+                for block in write_rows(repository.export_tasks(args.chunk_size), format, args.chunk_size):
+                    out.write(block)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+            print(f"Exported tasks as {format} ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+        else:
+            format = args.format or guess_format(args.file, default="jsonl")
+            src = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")
+            try:
+                count = import_rows(repository.import_tasks, read_rows(src, format), args.chunk_size)
+            finally:
+                if src is not sys.stdin:
+                    src.close()
+            print(f"Imported {count} tasks ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        repository.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
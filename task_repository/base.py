@@ -0,0 +1,177 @@
+# base.py - the storage interface every engine implements
+#
+# The API hands out tasks as plain dicts {"id", "name", "description", "status"};
+# engines may hold them internally as compact Task records. Engines raise
+# ValueError for unknown or duplicate ids so the apps can map it to 404/400.
+# A repository holds one owner's tasks; ids are numbered per owner (see tenants.py).
+
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+TASK_COLUMNS = ("name", "description", "status")
+# owner of every task written without one, and of all rows from before tasks had owners
+DEFAULT_OWNER = ""
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
+MAX_BATCH_SIZE = 1000
+BATCH_OPS = ("create", "update", "delete")
+# rows per transaction for /import and per fetch for /export
+BULK_CHUNK_SIZE = int(os.getenv("TODO_BULK_CHUNK_SIZE", "5000"))
+
+# tombstones older than this many versions are pruned every CHANGE_PRUNE_EVERY versions
+CHANGE_LOG_RETENTION = int(os.getenv("TODO_CHANGE_LOG_RETENTION", "10000"))
+CHANGE_PRUNE_EVERY = 1000
+MAX_CHANGES = 1000
+# seconds a run_once() result is kept for retries
+IDEMPOTENCY_TTL = float(os.getenv("TODO_IDEMPOTENCY_TTL", "86400"))
+
+
+class Task(NamedTuple):
+    """Compact, immutable task record: a plain tuple with no per-instance __dict__"""
+    id: int
+    name: str
+    description: str
+    status: bool
+
+
+class BatchAborted(Exception):
+    """Raised inside an atomic batch to roll the whole transaction back"""
+
+
+def aborted_batch(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """apply_batch() result of a rolled-back atomic batch: no item stays applied"""
+    return {
+        "committed": False,
+        "results": [r if not r["ok"] else {"index": r["index"], "ok": False, "error": "rolled back"} for r in results],
+    }
+
+
+class TaskRepository(ABC):
+    """Task storage engine. Every write bumps the data version exactly once."""
+
+    @abstractmethod
+    def init_db(self) -> None:
+        """Create or load the backing store; safe to call more than once"""
+
+    def close(self) -> None:
+        """Release resources and persist anything still buffered"""
+
+    @abstractmethod
+    def get_data_version(self) -> int:
+        """Monotonic counter that changes whenever any task is created, updated or deleted"""
+
+    def get_epoch(self) -> int:
+        """Identifies the run of data versions; it changes whenever versions start over from 0"""
+        return 0
+
+    @abstractmethod
+    def changes_since(self, since: int) -> Dict[str, Any]:
+        """{"version", "reset", "changes"} for tasks written after version `since`"""
+
+    @abstractmethod
+    def get_next_task_id(self) -> int:
+        """Hint only: another writer may take the id first; insert_task allocates atomically"""
+
+    @abstractmethod
+    def get_all_tasks(self) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def list_tasks(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        text: Optional[str] = None,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """One page of tasks ordered by id: {"tasks", "next_cursor"}"""
+
+    @abstractmethod
+    def iter_tasks(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def list_tasks_json(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[bytes, Optional[int]]:
+        """Like list_tasks, but the page comes back as a ready-made JSON array; limit=None means all"""
+
+    def export_tasks(self, chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """Every task in id order, fetched `chunk_size` rows at a time"""
+        yield from self.iter_tasks(chunk_size=chunk_size)
+
+    @abstractmethod
+    def import_tasks(self, rows: List[Dict[str, Any]]) -> int:
+        """Write one chunk of imported rows in a single transaction; return how many.
+
+        Rows with an id insert or overwrite that task (so dumps restore their
+        ids); rows without one get a new id.
+        """
+
+    @abstractmethod
+    def count_tasks(self, text: Optional[str] = None) -> Dict[str, int]:
+        """{"total", "done", "pending"} for tasks matching `text`"""
+
+    @abstractmethod
+    def search_tasks(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Tasks whose name or description contain every word of `query` as a prefix"""
+
+    @abstractmethod
+    def get_task(self, id: int) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def add_task(self, id: int, name: str, description: str, status: bool) -> str:
+        ...
+
+    @abstractmethod
+    def insert_task(self, name: str, description: str = "", status: bool = False) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def insert_tasks(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update_task(self, id: int, name: str, description: str, status: bool) -> str:
+        ...
+
+    @abstractmethod
+    def patch_task(self, id: int, **fields: Any) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def set_status(self, id: int, status: bool) -> bool:
+        """Return True if the status actually changed"""
+
+    @abstractmethod
+    def delete_task(self, id: int) -> str:
+        ...
+
+    @abstractmethod
+    def apply_batch(self, operations: List[Dict[str, Any]], atomic: bool = False) -> Dict[str, Any]:
+        """Apply create/update/delete operations in order: {"committed", "results"}"""
+
+    @abstractmethod
+    def run_once(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn() at most once per idempotency key: (result, replayed).
+
+        fn's writes and its JSON-serializable result are committed together;
+        a later call with the same key (within IDEMPOTENCY_TTL) returns the
+        stored result with replayed=True and writes nothing.
+        """
+
+    @abstractmethod
+    def get_outcome(self, key: str) -> Optional[Any]:
+        """The stored result of run_once(key, ...), or None if it has not run"""
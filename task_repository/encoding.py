@@ -0,0 +1,25 @@
+# encoding.py - fast JSON for the read path
+#
+# orjson is optional: with it installed encoding is several times faster than
+# the standard library; without it the same compact bytes come from json.
+
+import json
+from typing import Any, Iterable
+
+from .base import Task
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def encode_tasks(tasks: Iterable[Task]) -> bytes:
+    """JSON array of task objects from Task records"""
+    return dumps([task._asdict() for task in tasks])
@@ -0,0 +1,408 @@
+# memory.py - pure in-memory engine
+#
+# Tasks live as compact Task records in a dict keyed by id, with a sorted id
+# list for ordered/keyset scans and a set of ids per status. Nothing touches
+# disk, so it suits tests and hot sets that can be rebuilt; the data is lost
+# when the process exits and is not shared between worker processes.
+# Owners are kept apart by giving each one its own instance (see tenants.py).
+
+import bisect
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import base
+from .base import (
+    DEFAULT_PAGE_SIZE, MAX_BATCH_SIZE, MAX_CHANGES, MAX_PAGE_SIZE, STREAM_CHUNK_SIZE, TASK_COLUMNS,
+    BatchAborted, Task, TaskRepository, aborted_batch,
+)
+from .encoding import encode_tasks
+
+# (task id, task before the write or None if it did not exist)
+Journal = List[Tuple[int, Optional[Task]]]
+
+
+def _matches_text(task: Task, text: str) -> bool:
+    """Case-insensitive substring match, like the SQLite engine's LIKE filter"""
+    needle = text.lower()
+    return needle in task.name.lower() or needle in task.description.lower()
+
+
+def _matches_words(task: Task, words: List[str]) -> bool:
+    """Every query word is a prefix of some word in the task, like the FTS5 query"""
+    tokens = re.findall(r"\w+", f"{task.name} {task.description}".lower())
+    return all(any(token.startswith(word) for token in tokens) for word in words)
+
+
+class MemoryRepository(TaskRepository):
+    """Thread-safe task storage held entirely in process memory."""
+
+    def __init__(self):
+        self._tasks: Dict[int, Task] = {}
+        self._ids: List[int] = []
+        self._by_status: Dict[bool, Set[int]] = {True: set(), False: set()}
+        # task id -> version of its latest write; ids missing from _tasks are tombstones
+        self._changes: Dict[int, int] = {}
+        self._changes_floor = 0
+        self._version = 0
+        # versions restart at 0 with every new store, so they are only
+        # comparable within one epoch: a random id, small enough for JSON numbers
+        self._epoch = secrets.randbits(52)
+        # idempotency key -> (time stored, result) in the order stored
+        self._outcomes: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def init_db(self) -> None:
+        pass
+
+    # --- index maintenance; callers hold the lock ---
+
+    def _store(self, task: Task, journal: Journal) -> None:
+        id = task.id
+        previous = self._tasks.get(id)
+        journal.append((id, previous))
+        if previous is None:
+            bisect.insort(self._ids, id)
+        else:
+            self._by_status[previous.status].discard(id)
+        self._tasks[id] = task
+        self._by_status[task.status].add(id)
+
+    def _remove(self, id: int, journal: Journal) -> None:
+        previous = self._tasks.pop(id)
+        journal.append((id, previous))
+        del self._ids[bisect.bisect_left(self._ids, id)]
+        self._by_status[previous.status].discard(id)
+
+    def _undo(self, journal: Journal) -> None:
+        for id, previous in reversed(journal):
+            if previous is not None:
+                self._store(previous, [])
+            elif id in self._tasks:
+                self._remove(id, [])
+
+    def _commit(self, journal: Journal) -> None:
+        """Bump the data version once for a finished write"""
+        if not journal:
+            return
+        self._version += 1
+        touched = {id for id, _ in journal}
+        for id in touched:
+            self._changes[id] = self._version
+        if self._version % base.CHANGE_PRUNE_EVERY == 0 and self._version > base.CHANGE_LOG_RETENTION:
+            floor = self._version - base.CHANGE_LOG_RETENTION
+            for id, version in list(self._changes.items()):
+                if version <= floor and id not in self._tasks:
+                    del self._changes[id]
+            self._changes_floor = floor
+        self._written(touched)
+
+    def _written(self, ids: Set[int]) -> None:
+        """Hook for engines that persist committed writes (see WriteBehindRepository)"""
+
+    @contextmanager
+    def _write(self) -> Iterator[Journal]:
+        with self._lock:
+            journal: Journal = []
+            try:
+                yield journal
+            except BaseException:
+                self._undo(journal)
+                raise
+            self._commit(journal)
+
+    # --- row-level operations; callers hold the lock ---
+
+    def _insert(
+        self, name: str, description: str, status: bool, id: Optional[int], journal: Journal
+    ) -> Dict[str, Any]:
+        if name is None:
+            raise ValueError("NOT NULL constraint failed: tasks.name")
+        if id is None:
+            id = self._ids[-1] + 1 if self._ids else 1
+        elif int(id) in self._tasks:
+            raise ValueError(f"Task id {id} already exists")
+        task = Task(int(id), name, description or "", bool(status))
+        self._store(task, journal)
+        return task._asdict()
+
+    def _patch(self, id: int, fields: Dict[str, Any], journal: Journal) -> Dict[str, Any]:
+        unknown = set(fields) - set(TASK_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown task field(s): {', '.join(sorted(unknown))}")
+        current = self._tasks.get(int(id))
+        if current is None:
+            raise ValueError(f"Task {id} not found")
+        if fields:
+            task = current._replace(**fields)
+            task = task._replace(description=task.description or "", status=bool(task.status))
+            self._store(task, journal)
+            current = task
+        return current._asdict()
+
+    def _delete(self, id: int, journal: Journal) -> None:
+        if int(id) not in self._tasks:
+            raise ValueError(f"Task {id} not found")
+        self._remove(int(id), journal)
+
+    def _apply_op(self, op: Dict[str, Any], journal: Journal) -> Any:
+        kind = op.get("op")
+        if kind == "create":
+            return self._insert(
+                op["name"], op.get("description") or "", bool(op.get("status")), op.get("id"), journal
+            )
+        if op.get("id") is None:
+            raise ValueError(f"'{kind}' needs an id")
+        if kind == "update":
+            fields = {col: op[col] for col in TASK_COLUMNS if op.get(col) is not None}
+            return self._patch(op["id"], fields, journal)
+        if kind == "delete":
+            self._delete(op["id"], journal)
+            return {"id": int(op["id"])}
+        raise ValueError(f"Unknown operation '{kind}'")
+
+    def _scan(
+        self, status: Optional[bool], after_id: Optional[int], text: Optional[str] = None
+    ) -> Iterator[Task]:
+        """Tasks in id order after `after_id`; callers hold the lock"""
+        start = 0 if after_id is None else bisect.bisect_right(self._ids, int(after_id))
+        wanted = None if status is None else self._by_status[bool(status)]
+        for i in range(start, len(self._ids)):
+            id = self._ids[i]
+            if wanted is not None and id not in wanted:
+                continue
+            task = self._tasks[id]
+            if text and not _matches_text(task, text):
+                continue
+            yield task
+
+    # --- versions and change log ---
+
+    def get_data_version(self) -> int:
+        return self._version
+
+    def get_epoch(self) -> int:
+        return self._epoch
+
+    def changes_since(self, since: int) -> Dict[str, Any]:
+        with self._lock:
+            version = self._version
+            if since < self._changes_floor or since > version:
+                return {"version": version, "reset": True, "changes": []}
+            rows = sorted((v, id) for id, v in self._changes.items() if v > since)
+            if len(rows) > MAX_CHANGES:
+                return {"version": version, "reset": True, "changes": []}
+            changes = [
+                {"op": "upsert", "version": v, "task": self._tasks[id]._asdict()}
+                if id in self._tasks
+                else {"op": "delete", "version": v, "id": id}
+                for v, id in rows
+            ]
+        return {"version": version, "reset": False, "changes": changes}
+
+    # --- reads ---
+
+    def get_next_task_id(self) -> int:
+        with self._lock:
+            return self._ids[-1] + 1 if self._ids else 1
+
+    def get_all_tasks(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._tasks[id]._asdict() for id in self._ids]
+
+    def list_tasks(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        text: Optional[str] = None,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        skip = max(0, int(offset))
+        tasks: List[Dict[str, Any]] = []
+        has_more = False
+        with self._lock:
+            for task in self._scan(status, after_id, text):
+                if skip:
+                    skip -= 1
+                elif len(tasks) == limit:
+                    has_more = True
+                    break
+                else:
+                    tasks.append(task._asdict())
+        return {"tasks": tasks, "next_cursor": tasks[-1]["id"] if has_more else None}
+
+    def iter_tasks(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        # keyset chunks, so the lock is never held while the consumer runs
+        while True:
+            with self._lock:
+                chunk = []
+                for task in self._scan(status, after_id):
+                    chunk.append(task)
+                    if len(chunk) == chunk_size:
+                        break
+            for task in chunk:
+                yield task._asdict()
+            if len(chunk) < chunk_size:
+                return
+            after_id = chunk[-1].id
+
+    def list_tasks_json(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[bytes, Optional[int]]:
+        if limit is not None:
+            limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        records: List[Task] = []
+        has_more = False
+        with self._lock:
+            for task in self._scan(status, after_id):
+                if len(records) == limit:
+                    has_more = True
+                    break
+                records.append(task)
+        # records are immutable, so they can be encoded after the lock is released
+        return encode_tasks(records), (records[-1].id if has_more else None)
+
+    def count_tasks(self, text: Optional[str] = None) -> Dict[str, int]:
+        with self._lock:
+            if text:
+                matching = [t for t in self._tasks.values() if _matches_text(t, text)]
+                total, done = len(matching), sum(1 for t in matching if t.status)
+            else:
+                total, done = len(self._tasks), len(self._by_status[True])
+        return {"total": total, "done": done, "pending": total - done}
+
+    def search_tasks(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        words = re.findall(r"\w+", query.lower())
+        if not words:
+            return []
+        results: List[Dict[str, Any]] = []
+        with self._lock:
+            for id in self._ids:
+                task = self._tasks[id]
+                if _matches_words(task, words):
+                    results.append(task._asdict())
+                    if len(results) == limit:
+                        break
+        return results
+
+    def get_task(self, id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._tasks.get(int(id))
+            return task._asdict() if task else None
+
+    # --- writes ---
+
+    def add_task(self, id: int, name: str, description: str, status: bool) -> str:
+        with self._write() as journal:
+            self._insert(name, description, status, id, journal)
+        return f"Task {id} added."
+
+    def insert_task(self, name: str, description: str = "", status: bool = False) -> Dict[str, Any]:
+        with self._write() as journal:
+            return self._insert(name, description, status, None, journal)
+
+    def insert_tasks(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self._write() as journal:
+            return [
+                self._insert(item["name"], item.get("description") or "", bool(item.get("status")), None, journal)
+                for item in items
+            ]
+
+    def import_tasks(self, rows: List[Dict[str, Any]]) -> int:
+        with self._write() as journal:
+            for row in rows:
+                if row.get("id") is None:
+                    self._insert(row["name"], row.get("description") or "", bool(row.get("status")), None, journal)
+                elif row["name"] is None:
+                    raise ValueError("NOT NULL constraint failed: tasks.name")
+                else:
+                    task = Task(int(row["id"]), row["name"], row.get("description") or "", bool(row.get("status")))
+                    self._store(task, journal)
+        return len(rows)
+
+    def update_task(self, id: int, name: str, description: str, status: bool) -> str:
+        with self._write() as journal:
+            self._patch(id, {"name": name, "description": description, "status": status}, journal)
+        return f"Task {id} updated."
+
+    def patch_task(self, id: int, **fields: Any) -> Dict[str, Any]:
+        with self._write() as journal:
+            return self._patch(id, fields, journal)
+
+    def set_status(self, id: int, status: bool) -> bool:
+        with self._write() as journal:
+            current = self._tasks.get(int(id))
+            if current is None:
+                raise ValueError(f"Task {id} not found")
+            if current.status == bool(status):
+                return False
+            self._patch(id, {"status": status}, journal)
+        return True
+
+    def delete_task(self, id: int) -> str:
+        with self._write() as journal:
+            self._delete(id, journal)
+        return f"Task {id} deleted."
+
+    def apply_batch(self, operations: List[Dict[str, Any]], atomic: bool = False) -> Dict[str, Any]:
+        if len(operations) > MAX_BATCH_SIZE:
+            raise ValueError(f"A batch can hold at most {MAX_BATCH_SIZE} operations")
+        results: List[Dict[str, Any]] = []
+        try:
+            with self._write() as journal:
+                for index, op in enumerate(operations):
+                    item: Journal = []
+                    try:
+                        result = self._apply_op(op, item)
+                    except (ValueError, KeyError) as e:
+                        self._undo(item)
+                        message = f"Missing field {e}" if isinstance(e, KeyError) else str(e)
+                        results.append({"index": index, "ok": False, "error": message})
+                        if atomic:
+                            raise BatchAborted()
+                        continue
+                    journal.extend(item)
+                    results.append({"index": index, "ok": True, "result": result})
+        except BatchAborted:
+            return aborted_batch(results)
+        return {"committed": True, "results": results}
+
+    # --- idempotent writes ---
+
+    def run_once(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        # the lock is held throughout, so no other write interleaves; unlike the
+        # SQLite engine, writes fn made before raising are kept
+        with self._lock:
+            now = time.time()
+            while self._outcomes:
+                oldest = next(iter(self._outcomes.values()))
+                if oldest[0] >= now - base.IDEMPOTENCY_TTL:
+                    break
+                self._outcomes.popitem(last=False)
+            if key in self._outcomes:
+                return self._outcomes[key][1], True
+            result = fn()
+            self._outcomes[key] = (now, result)
+        return result, False
+
+    def get_outcome(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._outcomes.get(key)
+        if entry is None or entry[0] < time.time() - base.IDEMPOTENCY_TTL:
+            return None
+        return entry[1]
@@ -0,0 +1,113 @@
+# pool.py - tuned SQLite connections and a bounded, thread-safe pool
+
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List
+
+POOL_SIZE = int(os.getenv("TODO_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("TODO_DB_POOL_TIMEOUT", "10"))
+BUSY_TIMEOUT_MS = int(os.getenv("TODO_DB_BUSY_TIMEOUT_MS", "5000"))
+STATEMENT_CACHE_SIZE = 256
+# extra BEGIN IMMEDIATE attempts after busy_timeout runs out, for bursts from other worker processes
+WRITE_RETRIES = int(os.getenv("TODO_DB_WRITE_RETRIES", "5"))
+WRITE_RETRY_DELAY = 0.05
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA foreign_keys=ON",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open a tuned connection that can be shared across worker threads."""
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        isolation_level=None,  # transactions are managed explicitly by the repository
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def begin_immediate(conn: sqlite3.Connection) -> None:
+    """Take the write lock, retrying with jittered backoff while another process holds it"""
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if attempt == WRITE_RETRIES or not is_busy(e):
+                raise
+            time.sleep(WRITE_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections to one database, opened lazily up to `size`."""
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._all: List[sqlite3.Connection] = []
+
+    def acquire(self) -> sqlite3.Connection:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("Timed out waiting for a database connection")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            conn = connect(self.path)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conns:
+            conn.close()
@@ -0,0 +1,247 @@
+# schema.py - the one task schema and its migrations
+#
+# PRAGMA user_version records how many migrations a database has run. Every
+# step is idempotent (IF NOT EXISTS / checks) so databases created by earlier,
+# unversioned copies of this code (user_version 0) upgrade in place.
+
+import logging
+import sqlite3
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+TASKS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT DEFAULT '',
+        status INTEGER DEFAULT 0
+    )
+"""
+
+TASK_COLUMN_TYPES = {"id": "INTEGER", "name": "TEXT", "description": "TEXT", "status": "INTEGER"}
+
+
+def _create_tasks(conn: sqlite3.Connection) -> None:
+    """tasks table with TEXT/INTEGER columns; legacy VARCHAR/BOOLEAN tables are rebuilt"""
+    columns = {row[1]: row[2].upper() for row in conn.execute("PRAGMA table_info(tasks)")}
+    if columns and columns != TASK_COLUMN_TYPES:
+        conn.execute(TASKS_TABLE.format(name="tasks_migrated"))
+        conn.execute(
+            """
+            INSERT INTO tasks_migrated (id, name, description, status)
+            SELECT id, name, COALESCE(description, ''),
+                   CASE WHEN status IN (1, '1', 'true', 'True', 'TRUE') THEN 1 ELSE 0 END
+            FROM tasks
+            """
+        )
+        conn.execute("DROP TABLE tasks")
+        conn.execute("ALTER TABLE tasks_migrated RENAME TO tasks")
+    conn.execute(TASKS_TABLE.format(name="tasks"))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, id)")
+
+
+def _create_meta(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+
+
+def fts_schema(key: str) -> Tuple[str, ...]:
+    """FTS5 index over tasks.name/description whose rowid is the `key` column"""
+    return (
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            name, description, content='tasks', content_rowid='{key}'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, name, description)
+            VALUES (new.{key}, new.name, new.description);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, name, description)
+            VALUES ('delete', old.{key}, old.name, old.description);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF name, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, name, description)
+            VALUES ('delete', old.{key}, old.name, old.description);
+            INSERT INTO tasks_fts (rowid, name, description)
+            VALUES (new.{key}, new.name, new.description);
+        END
+        """,
+        # index whatever rows existed before the FTS table was created
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    )
+
+
+def _create_fts(conn: sqlite3.Connection) -> None:
+    """Full-text index; skipped (search falls back to LIKE) when SQLite lacks FTS5"""
+    if has_table(conn, "tasks_fts"):
+        return
+    try:
+        conn.execute("SAVEPOINT fts")
+        for statement in fts_schema("id"):
+            conn.execute(statement)
+        conn.execute("RELEASE fts")
+    except sqlite3.OperationalError as e:
+        conn.execute("ROLLBACK TO fts")
+        conn.execute("RELEASE fts")
+        logger.warning("FTS5 unavailable, task search will use LIKE: %s", e)
+
+
+# One row per task holding the data version of its latest create/update/delete;
+# deleted tasks stay as tombstones (no matching tasks row) until pruned. The
+# triggers run before the repository bumps data_version in the same
+# transaction, hence "+ 1". They upsert rather than INSERT OR REPLACE: a
+# trigger's OR clause is overridden by the outer statement's conflict policy,
+# which made an upsert into tasks abort on an existing task_changes row.
+def change_triggers(partitioned: bool) -> Tuple[str, ...]:
+    """Change-log triggers keyed on task_id, or on (owner, task_id) once tasks are partitioned"""
+    columns = "owner, task_id" if partitioned else "task_id"
+    return tuple(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS task_changes_{suffix} AFTER {event} ON tasks BEGIN
+            INSERT INTO task_changes ({columns}, version)
+            VALUES ({f"{row}.owner, " if partitioned else ""}{row}.id,
+                    (SELECT value FROM meta WHERE key = 'data_version') + 1)
+            ON CONFLICT({columns}) DO UPDATE SET version = excluded.version;
+        END
+        """
+        for suffix, event, row in (("ai", "INSERT", "new"), ("au", "UPDATE", "new"), ("ad", "DELETE", "old"))
+    )
+
+
+CHANGES_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS task_changes (
+        task_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_task_changes_version ON task_changes (version)",
+    *change_triggers(partitioned=False),
+    # clients whose version predates the change log have to refetch everything
+    """
+    INSERT OR IGNORE INTO meta (key, value)
+    SELECT 'changes_floor', value FROM meta WHERE key = 'data_version'
+    """,
+)
+
+
+def _create_change_log(conn: sqlite3.Connection) -> None:
+    for statement in CHANGES_SCHEMA:
+        conn.execute(statement)
+
+
+def _upsert_change_triggers(conn: sqlite3.Connection) -> None:
+    """Replace INSERT OR REPLACE change-log triggers from databases created before the fix"""
+    for suffix in ("ai", "au", "ad"):
+        conn.execute(f"DROP TRIGGER IF EXISTS task_changes_{suffix}")
+    for statement in change_triggers(partitioned=False):
+        conn.execute(statement)
+
+
+# Tasks are partitioned by owner: `id` is numbered per owner and (owner, id)
+# is unique, so the row key moves to `seq`. Existing rows go to the default
+# owner with seq = id, keeping their FTS rowids; the FTS index and change log
+# are recreated around the new keys.
+PARTITIONED_SCHEMA = (
+    """
+    CREATE TABLE tasks_partitioned (
+        seq INTEGER PRIMARY KEY,
+        owner TEXT NOT NULL DEFAULT '',
+        id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT DEFAULT '',
+        status INTEGER DEFAULT 0
+    )
+    """,
+    """
+    INSERT INTO tasks_partitioned (seq, owner, id, name, description, status)
+    SELECT id, '', id, name, description, status FROM tasks
+    """,
+    # also drops the old indexes and every trigger on tasks
+    "DROP TABLE tasks",
+    "ALTER TABLE tasks_partitioned RENAME TO tasks",
+    "CREATE UNIQUE INDEX idx_tasks_owner_id ON tasks (owner, id)",
+    "CREATE INDEX idx_tasks_owner_status ON tasks (owner, status, id)",
+    """
+    CREATE TABLE task_changes_partitioned (
+        owner TEXT NOT NULL DEFAULT '',
+        task_id INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        PRIMARY KEY (owner, task_id)
+    )
+    """,
+    "INSERT INTO task_changes_partitioned (task_id, version) SELECT task_id, version FROM task_changes",
+    "DROP TABLE task_changes",
+    "ALTER TABLE task_changes_partitioned RENAME TO task_changes",
+    "CREATE INDEX idx_task_changes_owner_version ON task_changes (owner, version)",
+    "CREATE INDEX idx_task_changes_version ON task_changes (version)",
+    *change_triggers(partitioned=True),
+)
+
+
+def _partition_by_owner(conn: sqlite3.Connection) -> None:
+    fts = has_table(conn, "tasks_fts")
+    for statement in PARTITIONED_SCHEMA:
+        conn.execute(statement)
+    if fts:
+        conn.execute("DROP TABLE tasks_fts")
+        for statement in fts_schema("seq"):
+            conn.execute(statement)
+
+
+# Results of mutations run under an idempotency key (SQLiteRepository.run_once).
+# A row commits in the same transaction as the writes it stands for, so a
+# retry with the key finds both or neither.
+OUTBOX_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS outbox (
+        owner TEXT NOT NULL DEFAULT '',
+        key TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created REAL NOT NULL,
+        PRIMARY KEY (owner, key)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_outbox_created ON outbox (created)",
+)
+
+
+def _create_outbox(conn: sqlite3.Connection) -> None:
+    for statement in OUTBOX_SCHEMA:
+        conn.execute(statement)
+
+
+# append only: a database at user_version N has run MIGRATIONS[:N]
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _create_tasks,
+    _create_meta,
+    _create_fts,
+    _create_change_log,
+    _upsert_change_triggers,
+    _partition_by_owner,
+    _create_outbox,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Run pending migrations inside the caller's write transaction; return the new version"""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version in range(current, SCHEMA_VERSION):
+        MIGRATIONS[version](conn)
+        conn.execute(f"PRAGMA user_version = {version + 1}")
+    return max(current, SCHEMA_VERSION)
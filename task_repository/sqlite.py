@@ -0,0 +1,687 @@
+# sqlite.py - the SQLite engine: every task query over one pooled database file
+#
+# Each repository reads and writes one owner's partition of the tasks table;
+# every query filters on owner first, so it is served by the (owner, id) and
+# (owner, status, id) indexes. for_owner() gives other owners' views over the
+# same connections.
+
+import contextvars
+import copy
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import base
+from .base import (
+    BULK_CHUNK_SIZE, DEFAULT_OWNER, DEFAULT_PAGE_SIZE, MAX_BATCH_SIZE, MAX_CHANGES, MAX_PAGE_SIZE,
+    STREAM_CHUNK_SIZE, TASK_COLUMNS, BatchAborted, TaskRepository, aborted_batch,
+)
+from .encoding import dumps
+from .pool import ConnectionPool, POOL_SIZE, POOL_TIMEOUT, begin_immediate, connect
+from .schema import SCHEMA_VERSION, has_table, migrate
+
+TASK_SELECT = "SELECT id, name, description, status FROM tasks"
+
+# insert or overwrite by id; ON CONFLICT DO UPDATE (rather than INSERT OR
+# REPLACE) keeps the FTS and change-log triggers firing as ordinary updates
+UPSERT_TASK = """
+    INSERT INTO tasks (owner, id, name, description, status) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(owner, id) DO UPDATE SET
+        name=excluded.name, description=excluded.description, status=excluded.status
+"""
+INSERT_TASK = "INSERT INTO tasks (owner, id, name, description, status) VALUES (?, ?, ?, ?, ?)"
+
+# (file, connection) of the write transaction run_once() holds open in this
+# context; writes to the same file join it under a savepoint
+_open_write: "contextvars.ContextVar[Optional[Tuple[str, sqlite3.Connection]]]" = contextvars.ContextVar(
+    "open_write", default=None
+)
+
+# one task as a JSON object, built by SQLite's JSON1 functions
+TASK_JSON = (
+    "json_object('id', id, 'name', name, 'description', COALESCE(description, ''),"
+    " 'status', json(CASE WHEN status THEN 'true' ELSE 'false' END))"
+)
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "done", "completed")
+    return False
+
+
+def _row_to_task(row: Any) -> Dict[str, Any]:
+    return {
+        "id": int(row[0]),
+        "name": row[1] or "",
+        "description": row[2] or "",
+        "status": _to_bool(row[3]),
+    }
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _where(
+    owner: str, status: Optional[bool], after_id: Optional[int] = None, text: Optional[str] = None
+) -> Tuple[str, List[Any]]:
+    clauses: List[str] = ["owner=?"]
+    params: List[Any] = [owner]
+    if status is not None:
+        clauses.append("status=?")
+        params.append(1 if status else 0)
+    if after_id is not None:
+        clauses.append("id>?")
+        params.append(int(after_id))
+    if text:
+        clauses.append("(name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')")
+        params.extend([_like_pattern(text)] * 2)
+    return f" WHERE {' AND '.join(clauses)}", params
+
+
+def _page_query(
+    owner: str, status: Optional[bool], after_id: Optional[int], text: Optional[str] = None
+) -> Tuple[str, Tuple[Any, ...]]:
+    where, params = _where(owner, status, after_id, text)
+    return f"{TASK_SELECT}{where} ORDER BY id ASC LIMIT ? OFFSET ?", tuple(params)
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix"""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{w}"*' for w in words)
+
+
+# --- Row-level helpers; callers own the transaction ---
+
+def _bump_version(conn: sqlite3.Connection) -> None:
+    """Advance the task-table version inside the caller's write transaction"""
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+    version = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+    if version % base.CHANGE_PRUNE_EVERY == 0 and version > base.CHANGE_LOG_RETENTION:
+        _prune_changes(conn, version - base.CHANGE_LOG_RETENTION)
+
+
+def _prune_changes(conn: sqlite3.Connection, floor: int) -> None:
+    conn.execute(
+        """
+        DELETE FROM task_changes WHERE version <= ? AND NOT EXISTS (
+            SELECT 1 FROM tasks t WHERE t.owner = task_changes.owner AND t.id = task_changes.task_id
+        )
+        """,
+        (floor,),
+    )
+    conn.execute("UPDATE meta SET value = ? WHERE key = 'changes_floor'", (floor,))
+
+
+def _next_id(conn: sqlite3.Connection, owner: str) -> int:
+    """The owner's next task id: one past its highest, read from the (owner, id) index.
+
+    Only atomic inside a write transaction, which holds the database write lock.
+    """
+    return conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tasks WHERE owner=?", (owner,)).fetchone()[0]
+
+
+def _insert_row(
+    conn: sqlite3.Connection,
+    owner: str,
+    name: str,
+    description: str = "",
+    status: bool = False,
+    id: Optional[int] = None,
+) -> Dict[str, Any]:
+    description = description or ""
+    generated = id is None
+    id = _next_id(conn, owner) if generated else int(id)
+    try:
+        conn.execute(INSERT_TASK, (owner, id, name, description, 1 if status else 0))
+    except sqlite3.IntegrityError as ie:
+        if generated:
+            raise ValueError(str(ie)) from ie
+        raise ValueError(f"Task id {id} already exists") from ie
+    return {"id": id, "name": name, "description": description, "status": bool(status)}
+
+
+def _patch_row(conn: sqlite3.Connection, owner: str, id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+    unknown = set(fields) - set(TASK_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown task field(s): {', '.join(sorted(unknown))}")
+    if "status" in fields:
+        fields = {**fields, "status": 1 if fields["status"] else 0}
+    if fields:
+        assignments = ", ".join(f"{col}=?" for col in fields)
+        cursor = conn.execute(
+            f"UPDATE tasks SET {assignments} WHERE owner=? AND id=?", (*fields.values(), owner, int(id))
+        )
+        if cursor.rowcount == 0:
+            raise ValueError(f"Task {id} not found")
+    row = conn.execute(f"{TASK_SELECT} WHERE owner=? AND id=?", (owner, int(id))).fetchone()
+    if not row:
+        raise ValueError(f"Task {id} not found")
+    return _row_to_task(row)
+
+
+def _delete_row(conn: sqlite3.Connection, owner: str, id: int) -> None:
+    if conn.execute("DELETE FROM tasks WHERE owner=? AND id=?", (owner, int(id))).rowcount == 0:
+        raise ValueError(f"Task {id} not found")
+
+
+def _apply_op(conn: sqlite3.Connection, owner: str, op: Dict[str, Any]) -> Any:
+    kind = op.get("op")
+    if kind == "create":
+        return _insert_row(
+            conn, owner, op["name"], op.get("description") or "", bool(op.get("status")), id=op.get("id")
+        )
+    if op.get("id") is None:
+        raise ValueError(f"'{kind}' needs an id")
+    if kind == "update":
+        fields = {col: op[col] for col in TASK_COLUMNS if op.get(col) is not None}
+        return _patch_row(conn, owner, op["id"], fields)
+    if kind == "delete":
+        _delete_row(conn, owner, op["id"])
+        return {"id": int(op["id"])}
+    raise ValueError(f"Unknown operation '{kind}'")
+
+
+class SQLiteRepository(TaskRepository):
+    """One owner's tasks in a SQLite file, shared safely between threads and processes."""
+
+    def __init__(
+        self,
+        path: str,
+        pool_size: int = POOL_SIZE,
+        pool_timeout: float = POOL_TIMEOUT,
+        owner: str = DEFAULT_OWNER,
+    ):
+        self.path = path
+        self.owner = owner
+        self.pool = ConnectionPool(path, size=pool_size, timeout=pool_timeout)
+        # set by init_db(); False when this SQLite build lacks FTS5 and search falls back to LIKE
+        self.fts_enabled = False
+        # set by init_db(); False when SQLite lacks JSON1 and list_tasks_json encodes in Python
+        self.json_enabled = False
+        # A connection that never writes: its PRAGMA data_version changes whenever any
+        # other connection, in this process or another worker, commits. Until then the
+        # cached data version is still current.
+        self._watch: Optional[sqlite3.Connection] = None
+        self._watch_marker: Optional[int] = None
+        self._watch_version = 0
+        self._watch_lock = threading.Lock()
+        # the repository that owns the pool and the watch connection
+        self._root = self
+
+    def for_owner(self, owner: str) -> "SQLiteRepository":
+        """Another owner's tasks in the same file, over this repository's connections"""
+        view = copy.copy(self)
+        view.owner = owner
+        return view
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """Pooled connection; inside run_once() on the same file, its transaction's, to see its writes"""
+        joined = _open_write.get()
+        if joined is not None and joined[0] == self.path:
+            yield joined[1]
+            return
+        with self.pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def _writer(self) -> Iterator[sqlite3.Connection]:
+        """Pooled connection wrapped in a BEGIN IMMEDIATE ... COMMIT transaction.
+
+        Inside run_once() on the same file, a savepoint in its transaction instead.
+        """
+        joined = _open_write.get()
+        if joined is not None and joined[0] == self.path:
+            conn = joined[1]
+            conn.execute("SAVEPOINT joined_write")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK TO joined_write")
+                conn.execute("RELEASE joined_write")
+                raise
+            conn.execute("RELEASE joined_write")
+            return
+        with self.pool.connection() as conn:
+            begin_immediate(conn)
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def init_db(self) -> None:
+        """Create or upgrade the schema; safe to call more than once.
+
+        A database already at SCHEMA_VERSION is only read, so workers starting
+        together do not queue on the write lock just to find nothing to do.
+        """
+        if self._root is not self:
+            self._root.init_db()
+            self.fts_enabled, self.json_enabled = self._root.fts_enabled, self._root.json_enabled
+            return
+        with self._reader() as conn:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+        if current < SCHEMA_VERSION:
+            with self._writer() as conn:
+                migrate(conn)
+        with self._reader() as conn:
+            self.fts_enabled = has_table(conn, "tasks_fts")
+            try:
+                conn.execute("SELECT json_object('ok', json('true'))")
+                self.json_enabled = True
+            except sqlite3.OperationalError:
+                self.json_enabled = False
+
+    def close(self) -> None:
+        if self._root is not self:
+            return  # views share the root's connections
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch, self._watch_marker = None, None
+        self.pool.close()
+
+    # --- versions and change log ---
+
+    def get_data_version(self) -> int:
+        """Monotonic counter that changes whenever any task is created, updated or deleted.
+
+        Coherent across worker processes: the stored counter is only re-read
+        when PRAGMA data_version on the watch connection reports a commit. The
+        counter belongs to the file, so owners sharing one see each other's
+        writes move it (their change logs stay separate).
+        """
+        root = self._root
+        with root._watch_lock:
+            if root._watch is None:
+                root._watch = connect(root.path)
+            marker = root._watch.execute("PRAGMA data_version").fetchone()[0]
+            if marker != root._watch_marker:
+                root._watch_version = root._watch.execute(
+                    "SELECT value FROM meta WHERE key = 'data_version'"
+                ).fetchone()[0]
+                root._watch_marker = marker
+            return root._watch_version
+
+    def changes_since(self, since: int) -> Dict[str, Any]:
+        """Tasks created, updated or deleted after version `since`.
+
+        Returns {"version", "reset", "changes"}; each change is {"op": "upsert",
+        "version", "task"} or {"op": "delete", "version", "id"}, one per task, in
+        version order. reset=True means the delta is unavailable (the log was
+        pruned past `since`, or it is too large) and the client should refetch.
+        """
+        with self._reader() as conn:
+            # one read snapshot for the version and the rows
+            conn.execute("BEGIN")
+            try:
+                meta = dict(conn.execute(
+                    "SELECT key, value FROM meta WHERE key IN ('data_version', 'changes_floor')"
+                ).fetchall())
+                version = meta["data_version"]
+                if since < meta.get("changes_floor", 0) or since > version:
+                    return {"version": version, "reset": True, "changes": []}
+                rows = conn.execute(
+                    """
+                    SELECT c.task_id, c.version, t.id, t.name, t.description, t.status
+                    FROM task_changes c LEFT JOIN tasks t ON t.owner = c.owner AND t.id = c.task_id
+                    WHERE c.owner = ? AND c.version > ?
+                    ORDER BY c.version, c.task_id
+                    LIMIT ?
+                    """,
+                    (self.owner, since, MAX_CHANGES + 1),
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        if len(rows) > MAX_CHANGES:
+            return {"version": version, "reset": True, "changes": []}
+        changes = [
+            {"op": "upsert", "version": row[1], "task": _row_to_task(row[2:])}
+            if row[2] is not None
+            else {"op": "delete", "version": row[1], "id": row[0]}
+            for row in rows
+        ]
+        return {"version": version, "reset": False, "changes": changes}
+
+    # --- reads ---
+
+    def get_next_task_id(self) -> int:
+        """Get the next available task ID (racy across connections; prefer insert_task)"""
+        with self._reader() as conn:
+            return _next_id(conn, self.owner)
+
+    def get_all_tasks(self) -> List[Dict[str, Any]]:
+        with self._reader() as conn:
+            rows = conn.execute(f"{TASK_SELECT} WHERE owner=? ORDER BY id ASC", (self.owner,)).fetchall()
+        return [_row_to_task(r) for r in rows]
+
+    def list_tasks(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        text: Optional[str] = None,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """Return one page of tasks ordered by id, plus the keyset cursor for the next page"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sql, params = _page_query(self.owner, status, after_id, text)
+        with self._reader() as conn:
+            rows = conn.execute(sql, (*params, limit + 1, max(0, int(offset)))).fetchall()
+        tasks = [_row_to_task(r) for r in rows[:limit]]
+        next_cursor = tasks[-1]["id"] if len(rows) > limit else None
+        return {"tasks": tasks, "next_cursor": next_cursor}
+
+    def iter_tasks(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield tasks in id order, reading one keyset chunk per pooled connection checkout"""
+        while True:
+            sql, params = _page_query(self.owner, status, after_id)
+            with self._reader() as conn:
+                rows = conn.execute(sql, (*params, chunk_size, 0)).fetchall()
+            for r in rows:
+                yield _row_to_task(r)
+            if len(rows) < chunk_size:
+                return
+            after_id = rows[-1][0]
+
+    def list_tasks_json(
+        self,
+        status: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[bytes, Optional[int]]:
+        """One page as a JSON array, serialized by SQLite straight from the cursor.
+
+        No Python object is built per row, which keeps large listings cheap in
+        CPU and memory. Returns (JSON bytes, next cursor or None).
+        """
+        where, params = _where(self.owner, status, after_id)
+        page = f"{TASK_SELECT}{where} ORDER BY id ASC"
+        if limit is not None:
+            limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+            page += " LIMIT ?"
+            params.append(limit)
+        with self._reader() as conn:
+            # one read snapshot for the page and the has-more check
+            conn.execute("BEGIN")
+            try:
+                if self.json_enabled:
+                    body, last_id, count = conn.execute(
+                        f"SELECT json_group_array({TASK_JSON}), MAX(id), COUNT(*) FROM ({page})", params
+                    ).fetchone()
+                    body = body.encode()
+                else:
+                    rows = conn.execute(page, params).fetchall()
+                    body = dumps([_row_to_task(r) for r in rows])
+                    last_id, count = (rows[-1][0] if rows else None), len(rows)
+                more = False
+                if limit is not None and count == limit:
+                    next_where, next_params = _where(self.owner, status, last_id)
+                    more = conn.execute(
+                        f"SELECT 1 FROM tasks{next_where} LIMIT 1", next_params
+                    ).fetchone() is not None
+            finally:
+                conn.execute("COMMIT")
+        return body, (last_id if more else None)
+
+    def count_tasks(self, text: Optional[str] = None) -> Dict[str, int]:
+        """Count matching tasks in one aggregate query: total, done and pending"""
+        where, params = _where(self.owner, None, text=text)
+        with self._reader() as conn:
+            total, done = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(status=1), 0) FROM tasks{where}", params
+            ).fetchone()
+        return {"total": total, "done": done, "pending": total - done}
+
+    def search_tasks(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Full-text search over task names and descriptions, best matches first"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        if not self.fts_enabled:
+            text = query.strip()
+            return self.list_tasks(text=text, limit=limit)["tasks"] if text else []
+        match = _fts_query(query)
+        if not match:
+            return []
+        with self._reader() as conn:
+            rows = conn.execute(
+                """
+                SELECT t.id, t.name, t.description, t.status
+                FROM tasks_fts JOIN tasks t ON t.seq = tasks_fts.rowid
+                WHERE tasks_fts MATCH ? AND t.owner = ?
+                ORDER BY rank
+                LIMIT ?
+                """,
+                (match, self.owner, limit),
+            ).fetchall()
+        return [_row_to_task(r) for r in rows]
+
+    def get_task(self, id: int) -> Optional[Dict[str, Any]]:
+        """Fetch a single task by primary key, or None if it does not exist"""
+        with self._reader() as conn:
+            row = conn.execute(f"{TASK_SELECT} WHERE owner=? AND id=?", (self.owner, int(id))).fetchone()
+        return _row_to_task(row) if row else None
+
+    # --- writes ---
+
+    def add_task(self, id: int, name: str, description: str, status: bool) -> str:
+        with self._writer() as conn:
+            _insert_row(conn, self.owner, name, description, status, id=id)
+            _bump_version(conn)
+        return f"Task {id} added."
+
+    def insert_task(self, name: str, description: str = "", status: bool = False) -> Dict[str, Any]:
+        """Insert a task under the owner's next id, allocated inside the write transaction"""
+        with self._writer() as conn:
+            task = _insert_row(conn, self.owner, name, description, status)
+            _bump_version(conn)
+        return task
+
+    def insert_tasks(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert many tasks in a single transaction and return the created rows in order"""
+        rows = [
+            (item["name"], item.get("description") or "", 1 if item.get("status") else 0)
+            for item in items
+        ]
+        if not rows:
+            return []
+        with self._writer() as conn:
+            first = _next_id(conn, self.owner)
+            conn.executemany(
+                INSERT_TASK, [(self.owner, first + i, *row) for i, row in enumerate(rows)]
+            )
+            _bump_version(conn)
+        return [
+            {"id": first + i, "name": name, "description": description, "status": bool(status)}
+            for i, (name, description, status) in enumerate(rows)
+        ]
+
+    def import_tasks(self, rows: List[Dict[str, Any]]) -> int:
+        """One executemany per kind of row inside a single transaction"""
+        keyed, fresh = [], []
+        for row in rows:
+            values = (row["name"], row.get("description") or "", 1 if row.get("status") else 0)
+            if row.get("id") is None:
+                fresh.append(values)
+            else:
+                keyed.append((self.owner, int(row["id"]), *values))
+        if not rows:
+            return 0
+        with self._writer() as conn:
+            try:
+                conn.executemany(UPSERT_TASK, keyed)
+                # new ids continue after the highest id, including the ones just imported
+                first = _next_id(conn, self.owner)
+                conn.executemany(INSERT_TASK, [(self.owner, first + i, *row) for i, row in enumerate(fresh)])
+            except sqlite3.IntegrityError as ie:
+                raise ValueError(str(ie)) from ie
+            _bump_version(conn)
+        return len(rows)
+
+    def export_tasks(self, chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """Every task from one read snapshot, streamed through a single cursor.
+
+        Runs on its own connection so a slow consumer never holds a pool slot;
+        while it is open the WAL cannot be checkpointed past its snapshot.
+        """
+        conn = connect(self.path)
+        try:
+            conn.execute("BEGIN")
+            cursor = conn.execute(f"{TASK_SELECT} WHERE owner=? ORDER BY id ASC", (self.owner,))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _row_to_task(row)
+        finally:
+            conn.close()
+
+    def update_task(self, id: int, name: str, description: str, status: bool) -> str:
+        with self._writer() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET name=?, description=?, status=? WHERE owner=? AND id=?",
+                (name, description, 1 if status else 0, self.owner, int(id)),
+            )
+            if cursor.rowcount == 0:
+                raise ValueError(f"Task {id} not found")
+            _bump_version(conn)
+        return f"Task {id} updated."
+
+    def patch_task(self, id: int, **fields: Any) -> Dict[str, Any]:
+        """Update only the given columns of a task and return the updated row"""
+        with self._writer() as conn:
+            task = _patch_row(conn, self.owner, id, fields)
+            if fields:
+                _bump_version(conn)
+        return task
+
+    def set_status(self, id: int, status: bool) -> bool:
+        """Set a task's status with one conditional UPDATE; return True if the row changed"""
+        value = 1 if status else 0
+        with self._writer() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status=? WHERE owner=? AND id=? AND status IS NOT ?",
+                (value, self.owner, int(id), value),
+            )
+            if cursor.rowcount:
+                _bump_version(conn)
+                return True
+            if not conn.execute("SELECT 1 FROM tasks WHERE owner=? AND id=?", (self.owner, int(id))).fetchone():
+                raise ValueError(f"Task {id} not found")
+        return False
+
+    def delete_task(self, id: int) -> str:
+        with self._writer() as conn:
+            _delete_row(conn, self.owner, id)
+            _bump_version(conn)
+        return f"Task {id} deleted."
+
+    def sync_rows(self, upserts: List[Dict[str, Any]], deletes: List[int], version: Optional[int] = None) -> None:
+        """Write full rows (insert or overwrite by id) and remove ids, in one transaction.
+
+        Used by the write-behind engine to flush its buffered state. With
+        `version` the data version becomes (at least) that value and the rows
+        are logged under it, so the caller's versions carry over to the next
+        process instead of restarting from this file's counter.
+        """
+        if not upserts and not deletes:
+            return
+        with self._writer() as conn:
+            if version is not None:
+                conn.execute(
+                    "UPDATE meta SET value = MAX(value, ?) WHERE key = 'data_version'", (version - 1,)
+                )
+            conn.executemany(
+                UPSERT_TASK,
+                [
+                    (self.owner, t["id"], t["name"], t["description"] or "", 1 if t["status"] else 0)
+                    for t in upserts
+                ],
+            )
+            conn.executemany(
+                "DELETE FROM tasks WHERE owner=? AND id=?", [(self.owner, int(id)) for id in deletes]
+            )
+            _bump_version(conn)
+
+    def apply_batch(self, operations: List[Dict[str, Any]], atomic: bool = False) -> Dict[str, Any]:
+        """Apply create/update/delete operations in order inside one transaction.
+
+        Each operation runs under its own savepoint and gets a result entry. With
+        atomic=True the first failure rolls back the whole batch; otherwise failed
+        items are skipped and the rest commit together.
+        """
+        if len(operations) > MAX_BATCH_SIZE:
+            raise ValueError(f"A batch can hold at most {MAX_BATCH_SIZE} operations")
+        results: List[Dict[str, Any]] = []
+        try:
+            with self._writer() as conn:
+                for index, op in enumerate(operations):
+                    conn.execute("SAVEPOINT batch_item")
+                    try:
+                        result = _apply_op(conn, self.owner, op)
+                    except (ValueError, KeyError, sqlite3.Error) as e:
+                        conn.execute("ROLLBACK TO batch_item")
+                        conn.execute("RELEASE batch_item")
+                        message = f"Missing field {e}" if isinstance(e, KeyError) else str(e)
+                        results.append({"index": index, "ok": False, "error": message})
+                        if atomic:
+                            raise BatchAborted()
+                        continue
+                    conn.execute("RELEASE batch_item")
+                    results.append({"index": index, "ok": True, "result": result})
+                if any(r["ok"] for r in results):
+                    _bump_version(conn)
+        except BatchAborted:
+            return aborted_batch(results)
+        return {"committed": True, "results": results}
+
+    # --- idempotent writes ---
+
+    def run_once(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn() at most once per key, its writes and the outbox row in one transaction"""
+        now = time.time()
+        with self._writer() as conn:
+            row = conn.execute(
+                "SELECT result FROM outbox WHERE owner=? AND key=? AND created >= ?",
+                (self.owner, key, now - base.IDEMPOTENCY_TTL),
+            ).fetchone()
+            if row:
+                return json.loads(row[0]), True
+            token = _open_write.set((self.path, conn))
+            try:
+                result = fn()
+            finally:
+                _open_write.reset(token)
+            conn.execute("DELETE FROM outbox WHERE created < ?", (now - base.IDEMPOTENCY_TTL,))
+            conn.execute(
+                "INSERT INTO outbox (owner, key, result, created) VALUES (?, ?, ?, ?)",
+                (self.owner, key, dumps(result).decode(), now),
+            )
+        return result, False
+
+    def get_outcome(self, key: str) -> Optional[Any]:
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT result FROM outbox WHERE owner=? AND key=? AND created >= ?",
+                (self.owner, key, time.time() - base.IDEMPOTENCY_TTL),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
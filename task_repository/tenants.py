@@ -0,0 +1,127 @@
+# tenants.py - one task partition per owner
+#
+# Every request acts for one owner (a user or a team), named by the X-Owner
+# header and carried through threads and tasks in the `current_owner` context
+# variable. TenantRepositories hands out that owner's repository:
+#
+# - "shared" (default): one database file; SQLite keeps all owners in one
+#   tasks table keyed and indexed by (owner, id), and every owner's
+#   repository is a view over the same connection pool
+# - "sharded": one database file per owner (<db dir>/tenants/<owner>.db), so
+#   owners share no pages, write lock or data version; the default owner keeps
+#   the original file
+#
+# Either way ids are numbered per owner: every owner's first task is #1.
+#
+# The apps do not authenticate anyone: X-Owner is taken as given, so it
+# partitions data but does not protect it. Deploy them behind a proxy that
+# authenticates each caller and sets X-Owner itself, replacing any value
+# the client sent.
+
+import contextvars
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from .base import DEFAULT_OWNER, TaskRepository
+from .encoding import dumps
+
+TENANCY_MODES = ("shared", "sharded")
+TENANCY = os.getenv("TODO_TENANCY", "shared").lower()
+OWNER_HEADER = os.getenv("TODO_OWNER_HEADER", "X-Owner")
+# owner names double as shard file names
+OWNER_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+current_owner: "contextvars.ContextVar[str]" = contextvars.ContextVar("task_owner", default=DEFAULT_OWNER)
+
+
+def check_owner(owner: Optional[str]) -> str:
+    """Validated owner name; None or "" means the default owner"""
+    if not owner:
+        return DEFAULT_OWNER
+    if not OWNER_PATTERN.fullmatch(owner):
+        raise ValueError(f"Invalid owner '{owner}'; use 1-64 letters, digits, '_' or '-'")
+    return owner
+
+
+@contextmanager
+def owner_scope(owner: Optional[str]) -> Iterator[str]:
+    """Act as `owner` for the duration of the block"""
+    token = current_owner.set(check_owner(owner))
+    try:
+        yield current_owner.get()
+    finally:
+        current_owner.reset(token)
+
+
+def shard_path(path: str, owner: str) -> str:
+    """Database file of `owner` when every owner has its own"""
+    if owner == DEFAULT_OWNER:
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(path)), "tenants", f"{owner}.db")
+
+
+class TenantRepositories:
+    """Per-owner repositories, built by `factory(owner)` and initialised on first use."""
+
+    def __init__(self, factory: Callable[[str], TaskRepository]):
+        self._factory = factory
+        self._repositories: Dict[str, TaskRepository] = {}
+        self._lock = threading.Lock()
+
+    def get(self, owner: Optional[str] = None) -> TaskRepository:
+        """The repository of `owner`, by default the current owner's"""
+        owner = current_owner.get() if owner is None else check_owner(owner)
+        repository = self._repositories.get(owner)
+        if repository is None:
+            with self._lock:
+                repository = self._repositories.get(owner)
+                if repository is None:
+                    repository = self._factory(owner)
+                    repository.init_db()
+                    self._repositories[owner] = repository
+        return repository
+
+    def init_db(self) -> None:
+        """Create or upgrade the default owner's store; other owners are set up when first used"""
+        self.get(DEFAULT_OWNER)
+
+    def close(self) -> None:
+        with self._lock:
+            repositories, self._repositories = self._repositories, {}
+        for repository in repositories.values():
+            repository.close()
+
+
+class OwnerMiddleware:
+    """Pure ASGI middleware running each request as the owner named in the X-Owner header.
+
+    The header is trusted as is; it must come from an authenticating proxy.
+    """
+
+    def __init__(self, app, header: str = OWNER_HEADER):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        value = next((v for k, v in scope["headers"] if k == self.header), b"")
+        try:
+            owner = check_owner(value.decode("latin-1").strip())
+        except ValueError as e:
+            await send({
+                "type": "http.response.start",
+                "status": 400,
+                "headers": [(b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": dumps({"detail": str(e)})})
+            return
+        token = current_owner.set(owner)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_owner.reset(token)
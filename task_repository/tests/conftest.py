@@ -0,0 +1,20 @@
+import pytest
+
+from task_repository import ENGINES, SQLiteRepository, create_repository
+
+
+@pytest.fixture(params=ENGINES)
+def repository(request, tmp_path):
+    """A fresh repository of each storage engine"""
+    repository = create_repository(str(tmp_path / "todos.db"), request.param)
+    repository.init_db()
+    yield repository
+    repository.close()
+
+
+@pytest.fixture
+def sqlite_repository(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / "todos.db"))
+    repository.init_db()
+    yield repository
+    repository.close()
@@ -0,0 +1,138 @@
+"""Every storage engine gives the same results for the same calls"""
+
+import pytest
+
+from task_repository import ENGINES, SQLiteRepository, create_repository
+
+
+def crud_script(repository):
+    """The same sequence of calls on any engine; returns everything they returned"""
+    results = [
+        repository.insert_task("Buy milk", "2 litres"),
+        repository.insert_tasks([{"name": "Call mom"}, {"name": "Pay rent", "status": True}]),
+        repository.add_task(10, "Book flights", "", False),
+        repository.update_task(10, "Book flights", "to Lisbon", True),
+        repository.patch_task(1, description="3 litres"),
+        repository.set_status(1, True),
+        repository.set_status(1, True),
+        repository.delete_task(2),
+        repository.get_all_tasks(),
+        repository.get_task(3),
+        repository.get_task(2),
+        repository.count_tasks(),
+        repository.list_tasks(status=True, limit=2),
+        repository.search_tasks("lisbon"),
+        repository.get_next_task_id(),
+        repository.get_data_version(),
+    ]
+    for call in (lambda: repository.add_task(10, "again", "", False), lambda: repository.delete_task(99)):
+        with pytest.raises(ValueError):
+            call()
+    return results
+
+
+def batch_script(repository):
+    repository.insert_tasks([{"name": "a"}, {"name": "b"}])
+    return [
+        repository.apply_batch(
+            [
+                {"op": "create", "name": "c"},
+                {"op": "update", "id": 1, "status": True},
+                {"op": "delete", "id": 99},
+                {"op": "delete", "id": 2},
+            ]
+        ),
+        repository.apply_batch([{"op": "update", "id": 3, "name": "C"}, {"op": "delete", "id": 99}], atomic=True),
+        repository.get_all_tasks(),
+        repository.get_data_version(),
+    ]
+
+
+def changes_script(repository):
+    repository.insert_tasks([{"name": "a"}, {"name": "b"}, {"name": "c"}])
+    since = repository.get_data_version()
+    repository.set_status(1, True)
+    repository.delete_task(2)
+    repository.patch_task(3, name="C")
+    repository.patch_task(3, name="CC")
+    return [repository.changes_since(0), repository.changes_since(since), repository.changes_since(10**6)]
+
+
+@pytest.mark.parametrize("script", [crud_script, batch_script, changes_script])
+def test_engines_agree(tmp_path, script):
+    outcomes = {}
+    for engine in ENGINES:
+        repository = create_repository(str(tmp_path / f"{engine}.db"), engine)
+        repository.init_db()
+        try:
+            outcomes[engine] = script(repository)
+        finally:
+            repository.close()
+    assert outcomes["memory"] == outcomes["sqlite"]
+    assert outcomes["write-behind"] == outcomes["sqlite"]
+
+
+def test_write_behind_persists_on_close(tmp_path):
+    path = str(tmp_path / "todos.db")
+    repository = create_repository(path, "write-behind")
+    repository.init_db()
+    crud_script(repository)
+    expected = repository.get_all_tasks()
+    repository.close()
+
+    reopened = SQLiteRepository(path)
+    reopened.init_db()
+    assert reopened.get_all_tasks() == expected
+    reopened.close()
+
+
+def test_aborted_atomic_batch_applies_nothing(repository):
+    repository.insert_task("a")
+    result = repository.apply_batch(
+        [{"op": "create", "name": "b"}, {"op": "update", "id": 1, "status": True}, {"op": "delete", "id": 99}],
+        atomic=True,
+    )
+    assert result == {
+        "committed": False,
+        "results": [
+            {"index": 0, "ok": False, "error": "rolled back"},
+            {"index": 1, "ok": False, "error": "rolled back"},
+            {"index": 2, "ok": False, "error": "Task 99 not found"},
+        ],
+    }
+    assert repository.get_all_tasks() == [{"id": 1, "name": "a", "description": "", "status": False}]
+
+
+def test_write_behind_versions_keep_rising_across_restarts(tmp_path):
+    path = str(tmp_path / "todos.db")
+    repository = create_repository(path, "write-behind")
+    repository.init_db()
+    for name in ("a", "b", "c"):
+        repository.insert_task(name)
+    repository.flush()
+    repository.set_status(1, True)
+    served = repository.get_data_version()
+    repository.close()
+
+    reopened = create_repository(path, "write-behind")
+    reopened.init_db()
+    try:
+        assert reopened.get_data_version() == served
+        assert reopened.get_epoch() == repository.get_epoch()
+        # a client at the last version served catches up; older ones refetch
+        assert reopened.changes_since(served) == {"version": served, "reset": False, "changes": []}
+        assert reopened.changes_since(served - 1)["reset"]
+        reopened.insert_task("d")
+        assert reopened.get_data_version() == served + 1
+        assert reopened.changes_since(served)["changes"][0]["task"]["name"] == "d"
+    finally:
+        reopened.close()
+
+
+def test_memory_engine_starts_a_new_epoch(tmp_path):
+    first = create_repository(str(tmp_path / "todos.db"), "memory")
+    first.insert_task("a")
+    first.close()
+    second = create_repository(str(tmp_path / "todos.db"), "memory")
+    assert second.get_data_version() == 0
+    assert second.get_epoch() != first.get_epoch()
@@ -0,0 +1,104 @@
+"""Schema migrations: databases from earlier versions of the apps upgrade in place"""
+
+import json
+import sqlite3
+
+import pytest
+
+from task_repository import SCHEMA_VERSION, SQLiteRepository
+from task_repository.schema import MIGRATIONS
+
+
+def _user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize(
+    "table",
+    [
+        # ai-agent/models.py before the shared package
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+        "description TEXT DEFAULT '', status INTEGER DEFAULT 0)",
+        # todo_app's VARCHAR/BOOLEAN variant
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, "
+        "description VARCHAR(200), status BOOLEAN)",
+    ],
+)
+def test_upgrade_from_unversioned_database(tmp_path, table):
+    path = str(tmp_path / "todos.db")
+    conn = sqlite3.connect(path)
+    conn.execute(table)
+    conn.executemany(
+        "INSERT INTO tasks (id, name, description, status) VALUES (?, ?, ?, ?)",
+        [(1, "Buy milk", None, "true"), (4, "Call mom", "on Sunday", 0)],
+    )
+    conn.commit()
+    conn.close()
+
+    repository = SQLiteRepository(path)
+    repository.init_db()
+    assert _user_version(path) == SCHEMA_VERSION
+    assert repository.get_all_tasks() == [
+        {"id": 1, "name": "Buy milk", "description": "", "status": True},
+        {"id": 4, "name": "Call mom", "description": "on Sunday", "status": False},
+    ]
+    assert [t["id"] for t in repository.search_tasks("sunday")] == [4]
+    assert repository.insert_task("Pay rent")["id"] == 5
+    repository.close()
+
+
+def test_partition_migration_keeps_rows_search_and_change_log(tmp_path):
+    """Migration 6 moves the row key to seq; FTS rowids and the change log must follow"""
+    path = str(tmp_path / "todos.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    for version, step in enumerate(MIGRATIONS[:5]):
+        step(conn)
+        conn.execute(f"PRAGMA user_version = {version + 1}")
+
+    def write(sql, *args):
+        # what the repository did before the migration: write, then bump the version
+        conn.execute(sql, args)
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+    write("INSERT INTO tasks (id, name, description, status) VALUES (1, 'Buy milk', '', 0)")
+    write("INSERT INTO tasks (id, name, description, status) VALUES (2, 'Call mom', '', 0)")
+    write("INSERT INTO tasks (id, name, description, status) VALUES (7, 'Book flights', 'to Lisbon', 0)")
+    write("UPDATE tasks SET status = 1 WHERE id = 1")
+    write("DELETE FROM tasks WHERE id = 2")
+    fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone() is not None
+    before = json.dumps(conn.execute("SELECT task_id, version FROM task_changes ORDER BY task_id").fetchall())
+    conn.close()
+
+    repository = SQLiteRepository(path)
+    repository.init_db()
+    assert _user_version(path) == SCHEMA_VERSION
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT seq, owner, id FROM tasks ORDER BY seq").fetchall() == [(1, "", 1), (7, "", 7)]
+    assert json.dumps(conn.execute("SELECT task_id, version FROM task_changes ORDER BY task_id").fetchall()) == before
+    if fts:
+        assert conn.execute("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'lisbon'").fetchall() == [(7,)]
+    conn.close()
+
+    assert repository.changes_since(3) == {
+        "version": 5,
+        "reset": False,
+        "changes": [
+            {"op": "upsert", "version": 4, "task": {"id": 1, "name": "Buy milk", "description": "", "status": True}},
+            {"op": "delete", "version": 5, "id": 2},
+        ],
+    }
+    # the triggers follow the new key: renames are searchable, new rows get the next id
+    repository.patch_task(7, description="to Porto")
+    assert repository.search_tasks("lisbon") == []
+    assert [t["id"] for t in repository.search_tasks("porto")] == [7]
+    assert repository.insert_task("Pay rent")["id"] == 8
+    alice = repository.for_owner("alice")
+    assert alice.insert_task("hers")["id"] == 1
+    assert [t["id"] for t in alice.search_tasks("hers")] == [1]
+    assert repository.changes_since(5)["changes"][-1]["task"]["id"] == 8
+    repository.close()
@@ -0,0 +1,75 @@
+"""run_once: mutations recorded in the outbox are replayed, not repeated"""
+
+import pytest
+
+from task_repository import base
+
+
+def test_run_once_replays(repository):
+    calls = []
+
+    def create():
+        calls.append(1)
+        task = repository.insert_task("Buy milk")
+        repository.set_status(task["id"], True)
+        return {"created": task["id"]}
+
+    assert repository.run_once("k", create) == ({"created": 1}, False)
+    assert repository.run_once("k", create) == ({"created": 1}, True)
+    assert len(calls) == 1
+    assert repository.get_outcome("k") == {"created": 1}
+    assert repository.get_outcome("other") is None
+    assert repository.count_tasks() == {"total": 1, "done": 1, "pending": 0}
+
+
+def test_run_once_does_not_record_failures(repository):
+    def fail():
+        raise RuntimeError("model went away")
+
+    with pytest.raises(RuntimeError):
+        repository.run_once("k", fail)
+    assert repository.get_outcome("k") is None
+    assert repository.run_once("k", lambda: "done") == ("done", False)
+
+
+def test_run_once_expires(repository, monkeypatch):
+    repository.run_once("k", lambda: "first")
+    monkeypatch.setattr(base, "IDEMPOTENCY_TTL", -1.0)
+    assert repository.get_outcome("k") is None
+    assert repository.run_once("k", lambda: "second") == ("second", False)
+
+
+def test_run_once_rolls_back_writes_with_fn(sqlite_repository):
+    def fail():
+        sqlite_repository.insert_task("half done")
+        raise RuntimeError("model went away")
+
+    version = sqlite_repository.get_data_version()
+    with pytest.raises(RuntimeError):
+        sqlite_repository.run_once("k", fail)
+    assert sqlite_repository.get_all_tasks() == []
+    assert sqlite_repository.get_data_version() == version
+
+
+def test_run_once_rolls_back_writes_with_outbox_row(sqlite_repository):
+    # the result cannot be stored, so the write it stands for must not stay either
+    with pytest.raises(TypeError):
+        sqlite_repository.run_once("k", lambda: {"task": sqlite_repository.insert_task("a"), "bad": object()})
+    assert sqlite_repository.get_all_tasks() == []
+    assert sqlite_repository.get_outcome("k") is None
+
+
+def test_run_once_joins_nested_writes(sqlite_repository):
+    other = sqlite_repository.for_owner("alice")
+
+    def writes():
+        first = sqlite_repository.insert_task("kept")
+        with pytest.raises(ValueError):
+            sqlite_repository.delete_task(99)  # rolls back to its savepoint only
+        second = other.insert_task("alice's")
+        return [first["id"], second["id"], sqlite_repository.count_tasks()["total"]]
+
+    assert sqlite_repository.run_once("k", writes) == ([1, 1, 1], False)
+    assert [t["name"] for t in sqlite_repository.get_all_tasks()] == ["kept"]
+    assert [t["name"] for t in other.get_all_tasks()] == ["alice's"]
+    assert other.get_outcome("k") is None  # outcomes are per owner
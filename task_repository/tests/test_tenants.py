@@ -0,0 +1,12 @@
+"""Owners' partitions of one database file"""
+
+
+def test_owners_are_isolated(sqlite_repository):
+    alice = sqlite_repository.for_owner("alice")
+    assert sqlite_repository.insert_task("mine")["id"] == 1
+    assert alice.insert_task("hers")["id"] == 1
+    alice.delete_task(1)
+    assert [t["name"] for t in sqlite_repository.get_all_tasks()] == ["mine"]
+    assert alice.get_all_tasks() == []
+    assert [c["op"] for c in alice.changes_since(0)["changes"]] == ["delete"]
+    assert [c["op"] for c in sqlite_repository.changes_since(0)["changes"]] == ["upsert"]
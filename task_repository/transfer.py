@@ -0,0 +1,131 @@
+# transfer.py - streaming CSV / JSONL import and export
+#
+# Both directions work on iterators, one BULK_CHUNK_SIZE chunk at a time, so
+# loading or dumping a million tasks needs memory for a chunk, not the table.
+# Dumps carry ids; importing one into an empty database restores it as is.
+
+import csv
+import io
+import json
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .base import BULK_CHUNK_SIZE
+from .encoding import dumps
+
+FORMATS = ("csv", "jsonl")
+CSV_FIELDS = ("id", "name", "description", "status")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+_TRUE = {"1", "true", "t", "yes", "y", "done"}
+_FALSE = {"", "0", "false", "f", "no", "n", "pending"}
+
+
+def guess_format(filename: str, default: Optional[str] = None) -> str:
+    for extension, format in EXTENSIONS.items():
+        if filename.lower().endswith(extension):
+            return format
+    if default is None:
+        raise ValueError(f"Cannot tell the format of '{filename}'; expected one of {', '.join(FORMATS)}")
+    return default
+
+
+def _to_status(value: Any) -> bool:
+    if value is None or isinstance(value, (bool, int, float)):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"unrecognised status '{value}'")
+
+
+def _to_row(record: Any) -> Dict[str, Any]:
+    if not isinstance(record, dict):
+        raise ValueError("expected an object with a name")
+    name = record.get("name")
+    if name is None or not str(name).strip():
+        raise ValueError("missing name")
+    id = record.get("id")
+    return {
+        "id": None if id in (None, "") else int(id),
+        "name": str(name),
+        "description": str(record.get("description") or ""),
+        "status": _to_status(record.get("status")),
+    }
+
+
+def _records(lines: Iterable[str], format: str) -> Iterator[Tuple[int, Any]]:
+    """(line number, raw record) pairs"""
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+    elif format == "jsonl":
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Line {number}: {e}") from e
+    else:
+        raise ValueError(f"Unknown format '{format}'; expected one of {', '.join(FORMATS)}")
+
+
+def read_rows(lines: Iterable[str], format: str) -> Iterator[Dict[str, Any]]:
+    """Task rows parsed lazily from CSV (with a header) or JSONL text lines"""
+    for number, record in _records(lines, format):
+        try:
+            yield _to_row(record)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Line {number}: {e}") from e
+
+
+def write_rows(tasks: Iterable[Dict[str, Any]], format: str, chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[bytes]:
+    """Encode tasks as CSV or JSONL, one bytes block per `chunk_size` tasks"""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format '{format}'; expected one of {', '.join(FORMATS)}")
+    tasks = iter(tasks)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == "csv":
+        writer.writerow(CSV_FIELDS)
+    while True:
+        chunk = list(islice(tasks, chunk_size))
+        if format == "csv":
+            writer.writerows(
+                (t["id"], t["name"], t["description"], "true" if t["status"] else "false") for t in chunk
+            )
+            block = buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            block = b"".join(dumps(t) + b"\n" for t in chunk)
+        if block:
+            yield block
+        if len(chunk) < chunk_size:
+            return
+
+
+def import_rows(
+    write: Callable[[List[Dict[str, Any]]], int],
+    rows: Iterable[Dict[str, Any]],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> int:
+    """Feed rows to `write` (a repository's import_tasks) one chunk at a time; return the count.
+
+    Each chunk is its own transaction, so chunks already written stay written
+    if a later row is invalid.
+    """
+    rows = iter(rows)
+    total = 0
+    while True:
+        try:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return total
+            total += write(chunk)
+        except ValueError as e:
+            raise ValueError(f"{e} ({total} rows imported before the error)") from e
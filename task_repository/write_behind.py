@@ -0,0 +1,119 @@
+# write_behind.py - in-memory reads with batched, asynchronous SQLite persistence
+#
+# On init_db() every row is loaded from SQLite into a MemoryRepository, which
+# then serves all reads and writes. Each committed write marks its task ids
+# dirty; a background thread flushes the latest state of the dirty rows to
+# SQLite every FLUSH_INTERVAL seconds (sooner once FLUSH_BATCH rows are
+# waiting), so repeated writes to one task cost a single row write.
+#
+# Trade-offs: writes from the last flush interval are lost if the process
+# dies without close(), and the database must not be written by anything
+# else (including other worker processes) while this engine owns it.
+# run_once() results are kept in memory only, like the buffered writes.
+
+import atexit
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Set
+
+from .base import DEFAULT_OWNER, Task
+from .memory import MemoryRepository
+from .sqlite import SQLiteRepository
+
+FLUSH_INTERVAL = float(os.getenv("TODO_FLUSH_INTERVAL", "1.0"))
+FLUSH_BATCH = int(os.getenv("TODO_FLUSH_BATCH", "500"))
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindRepository(MemoryRepository):
+    """MemoryRepository whose writes are persisted to SQLite in the background."""
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_batch: int = FLUSH_BATCH,
+        owner: str = DEFAULT_OWNER,
+    ):
+        super().__init__()
+        self.store = SQLiteRepository(path, owner=owner)
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        # task id -> latest row to write, or None to delete it
+        self._dirty: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._wakeup = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopping = False
+        self._flusher: Optional[threading.Thread] = None
+
+    def init_db(self) -> None:
+        if self._flusher is not None:
+            return
+        self.store.init_db()
+        self._stopping = False
+        with self._lock:
+            for task in self.store.get_all_tasks():
+                self._store(Task(**task), [])
+            self._version = self._changes_floor = self.store.get_data_version()
+        self._flusher = threading.Thread(target=self._run, name="task-write-behind", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _written(self, ids: Set[int]) -> None:
+        for id in ids:
+            task = self._tasks.get(id)
+            self._dirty[id] = task._asdict() if task else None
+        if len(self._dirty) >= self.flush_batch:
+            with self._wakeup:
+                self._wakeup.notify()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            with self._wakeup:
+                self._wakeup.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed; will retry")
+
+    def flush(self) -> int:
+        """Write all dirty rows to SQLite now; return how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                # the version of the newest write in `dirty`, persisted with it
+                dirty, self._dirty, version = self._dirty, {}, self._version
+            if not dirty:
+                return 0
+            upserts = [task for task in dirty.values() if task is not None]
+            deletes = [id for id, task in dirty.items() if task is None]
+            try:
+                self.store.sync_rows(upserts, deletes, version)
+            except Exception:
+                with self._lock:
+                    # keep anything written since the swap; it is newer
+                    for id, task in dirty.items():
+                        self._dirty.setdefault(id, task)
+                raise
+            return len(dirty)
+
+    def get_epoch(self) -> int:
+        # flushes carry the data version over to SQLite, so it survives restarts
+        return self.store.get_epoch()
+
+    def pending_writes(self) -> int:
+        with self._lock:
+            return len(self._dirty)
+
+    def close(self) -> None:
+        if self._flusher is None:
+            return
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify()
+        self._flusher.join()
+        self._flusher = None
+        self.flush()
+        self.store.close()
+        atexit.unregister(self.close)
@@ -1,11 +1,25 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import HTTPException
+from fastapi import HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
-import sqlite3
+from typing import List, Literal, Optional
+import asyncio
+import io
+import os
+import sys
+import tempfile
 
-DB_NAME = "todos.db"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))  # repository root, for task_repository
+
+from task_repository import (  # noqa: E402
+    create_tenants, dumps, import_rows, read_rows, write_rows, OwnerMiddleware, MAX_BATCH_SIZE, MAX_PAGE_SIZE,
+    MEDIA_TYPES,
+)
+
+DB_NAME = os.path.join(BASE_DIR, "todos.db")
 
 class Todo(BaseModel):
     id : int
@@ -13,8 +27,24 @@ class Todo(BaseModel):
     description : str
     status : bool
 
+class BatchOperation(BaseModel):
+    op : Literal["create", "update", "delete"]
+    id : int
+    name : Optional[str] = None
+    description : Optional[str] = None
+    status : Optional[bool] = None
+
+class BatchRequest(BaseModel):
+    operations : List[BatchOperation]
+    atomic : bool = False
+
 app = FastAPI()
 
+# tenants.get() is the repository of the request's owner (X-Owner header)
+tenants = create_tenants(DB_NAME)
+tenants.init_db()
+
+app.add_middleware(OwnerMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8000", "http://127.0.0.1:8000"],
@@ -25,99 +55,97 @@ app.add_middleware(
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+def stream_tasks(repository, status, after_id):
+    for task in repository.iter_tasks(status=status, after_id=after_id):
+        yield dumps(task) + b"\n"
+
+
 @app.get('/')
-def display_tasks():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT * FROM tasks;
-    """)
-    records = cursor.fetchall()
-    conn.close()
-    
-    todo_list = []
-    
-    for record in records:
-        new_record = {
-            "id" : record[0],
-            "name" : record[1],
-            "description" : record[2],
-            "status" : bool(record[3])
-        }     
-        todo_list.append(new_record)
-        
-    return todo_list
-        
-        
+def display_tasks(
+    status: Optional[bool] = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    if format == "ndjson":
+        return StreamingResponse(stream_tasks(tenants.get(), status, cursor), media_type="application/x-ndjson")
+
+    # already-encoded JSON from the repository; no limit means every matching task
+    tasks, next_cursor = tenants.get().list_tasks_json(status=status, after_id=cursor, limit=limit)
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
+    return Response(tasks, media_type="application/json", headers=headers)
+
+
 @app.post('/add')
 def add_task(task : Todo):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT * FROM tasks WHERE id=?;
-    """, (task.id,))
-    record = cursor.fetchone()
-    if record:
-        conn.close()
+    try:
+        tenants.get().add_task(task.id, task.name, task.description, task.status)
+    except ValueError:
         raise HTTPException(status_code=400, detail=f"Id {task.id} already exists")
 
-    cursor.execute("""
-        INSERT INTO tasks (id, name, description, status) VALUES (?, ?, ?, ?);
-    """, (task.id, task.name, task.description, task.status))
-
-    conn.commit()
-    conn.close()
-
     return {"message" : "new task added successfully"}
 
 
 @app.put("/update")
 def update_task(task: Todo):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT * FROM tasks WHERE id=?
-    """, (task.id,))
-    record = cursor.fetchone()
-    if not record:
-        conn.close()
+    try:
+        tenants.get().update_task(task.id, task.name, task.description, task.status)
+    except ValueError:
         raise HTTPException(status_code=404, detail=f"Task {task.id} not found")
-    
-    cursor.execute("""
-        UPDATE tasks
-        SET name=?, description=?, status=?
-        WHERE id=?;
-    """,(task.name, task.description, task.status, task.id))
-
-    conn.commit()
-    conn.close()
-    
+
     return {"message" : f"task {task.id} is updated successfully"}
 
 
 @app.delete("/delete/{id}")
 def delete_task(id : int):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT * FROM tasks WHERE id=?;
-    """, (id,))
-    record = cursor.fetchone()
-    if not record:
-        conn.close()
+    try:
+        tenants.get().delete_task(id)
+    except ValueError:
         raise HTTPException(status_code=404, detail=f"Task {id} not found")
-    
-    
-    cursor.execute("""
-        DELETE FROM tasks WHERE id=?;
-    """, (id,))
-    
-    conn.commit()
-    conn.close()
-    
+
     return {"message" : "task {id} deleted successfully"}
-    
\ No newline at end of file
+
+
+@app.post("/batch")
+def batch(request: BatchRequest):
+    if not request.operations or len(request.operations) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch needs 1 to {MAX_BATCH_SIZE} operations")
+
+    # one transaction for the whole batch; a failed item only undoes itself,
+    # or with atomic=true the whole batch
+    result = tenants.get().apply_batch(
+        [op.model_dump(exclude_none=True) for op in request.operations], atomic=request.atomic
+    )
+    if not result["committed"]:
+        raise HTTPException(status_code=409, detail=result)
+    return result
+
+
+def import_file(upload, format):
+    lines = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    return import_rows(tenants.get().import_tasks, read_rows(lines, format))
+
+
+@app.post("/import")
+async def import_tasks(request: Request, format: Optional[str] = Query(None, pattern="^(csv|jsonl)$")):
+    # spool the body to disk, then parse and write it in chunks off the event loop
+    format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    with tempfile.TemporaryFile() as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            imported = await asyncio.to_thread(import_file, upload, format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return {"imported" : imported}
+
+
+@app.get("/export")
+def export_tasks(format: str = Query("jsonl", pattern="^(csv|jsonl)$")):
+    return StreamingResponse(
+        write_rows(tenants.get().export_tasks(), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+    )